@@ -0,0 +1,208 @@
+"""
+异步数据访问层
+读操作在只读连接池线程中执行；写操作交给单独的写线程，把同时到达的写入合并为一次事务提交（group commit），
+每个写操作包在 SAVEPOINT 中，单条失败只回滚自己。带 coalesce_key 的写操作在排队期间被后来者覆盖，
+编辑器连续自动保存同一份简历时只写入最新内容
+"""
+
+import os
+import time
+import queue
+import asyncio
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Any, Dict, Hashable, List, Tuple
+
+from database import connect, bind_thread_connection
+from tracing import get_logger, span
+
+DB_READ_POOL_SIZE = int(os.environ.get("DB_READ_POOL_SIZE", "4"))
+# 单次事务最多合并的写操作数
+DB_WRITE_BATCH_SIZE = int(os.environ.get("DB_WRITE_BATCH_SIZE", "64"))
+# 收到第一个写操作后再等待多久收集同批写入（毫秒）
+DB_WRITE_BATCH_WINDOW_MS = float(os.environ.get("DB_WRITE_BATCH_WINDOW_MS", "1"))
+
+log = get_logger("db")
+
+_read_pool: Optional[ThreadPoolExecutor] = None
+_writer: Optional["_Writer"] = None
+_init_lock = threading.Lock()
+
+
+def _open_read_connection():
+    bind_thread_connection(connect(readonly=True))
+
+
+def _get_read_pool() -> ThreadPoolExecutor:
+    global _read_pool
+    if _read_pool is None:
+        with _init_lock:
+            if _read_pool is None:
+                _read_pool = ThreadPoolExecutor(
+                    max_workers=DB_READ_POOL_SIZE, thread_name_prefix="db-read",
+                    initializer=_open_read_connection,
+                )
+    return _read_pool
+
+
+async def read(fn: Callable[..., Any], *args) -> Any:
+    """在读连接池中执行 database 模块的读函数，如 await read(get_resume_by_id, resume_id, user_id)"""
+    with span("db_read"):
+        # run_in_executor 不会带上 contextvars，手动复制，读函数里的日志和计时仍归属当前请求
+        call = functools.partial(contextvars.copy_context().run, fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(_get_read_pool(), call)
+
+
+class _WriteOp:
+    """一个排队中的写操作；被合并的请求共享同一个 _WriteOp，全部拿到最后一次写入的结果"""
+
+    def __init__(self, fn: Callable[..., Any], args: Tuple, coalesce_key: Optional[Hashable]):
+        self.fn = fn
+        self.args = args
+        self.coalesce_key = coalesce_key
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def resolve(self, result: Any = None, error: Optional[BaseException] = None):
+        for loop, future in self.waiters:
+            loop.call_soon_threadsafe(_set_future, future, result, error)
+
+
+def _set_future(future: asyncio.Future, result: Any, error: Optional[BaseException]):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class _Writer:
+    """单写线程，独占一个写连接"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[_WriteOp]]" = queue.Queue()
+        # 尚未被写线程取走、可被覆盖的写操作
+        self._pending: Dict[Hashable, _WriteOp] = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[..., Any], args: Tuple, coalesce_key: Optional[Hashable]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            op = self._pending.get(coalesce_key) if coalesce_key is not None else None
+            if op is not None:
+                op.fn, op.args = fn, args
+                op.waiters.append((loop, future))
+                return future
+            op = _WriteOp(fn, args, coalesce_key)
+            op.waiters.append((loop, future))
+            if coalesce_key is not None:
+                self._pending[coalesce_key] = op
+        self._queue.put(op)
+        return future
+
+    def stop(self, timeout: float):
+        """处理完已排队的写操作后退出"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _next_batch(self) -> Tuple[List[_WriteOp], bool]:
+        op = self._queue.get()
+        if op is None:
+            return [], True
+        batch = [op]
+        deadline = time.monotonic() + DB_WRITE_BATCH_WINDOW_MS / 1000
+        stopping = False
+        while len(batch) < DB_WRITE_BATCH_SIZE:
+            try:
+                op = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if op is None:
+                stopping = True
+                break
+            batch.append(op)
+        # 取走之后不再接受覆盖，后续同 key 的写操作排入下一批
+        with self._lock:
+            for op in batch:
+                if op.coalesce_key is not None and self._pending.get(op.coalesce_key) is op:
+                    del self._pending[op.coalesce_key]
+        return batch, stopping
+
+    def _run(self):
+        conn = connect(autocommit=True)
+        try:
+            while True:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._commit(conn, batch)
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    def _commit(self, conn, batch: List[_WriteOp]):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for op in batch:
+                conn.execute("SAVEPOINT op")
+                try:
+                    result = op.fn(conn, *op.args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    results.append((op, None, e))
+                else:
+                    conn.execute("RELEASE op")
+                    results.append((op, result, None))
+            conn.execute("COMMIT")
+        except Exception as e:
+            log.exception("批量写入失败", extra={"fields": {"batch_size": len(batch)}})
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for op in batch:
+                op.resolve(error=e)
+            return
+        log.debug("批量写入完成", extra={"fields": {"batch_size": len(batch)}})
+        for op, result, error in results:
+            op.resolve(result, error)
+
+
+def _get_writer() -> _Writer:
+    global _writer
+    if _writer is None:
+        with _init_lock:
+            if _writer is None:
+                _writer = _Writer()
+    return _writer
+
+
+async def write(fn: Callable[..., Any], *args, coalesce_key: Optional[Hashable] = None) -> Any:
+    """
+    由写线程执行 database 模块的连接级写函数（fn(db, *args)，不提交），与同时到达的写入一起提交
+
+    Args:
+        coalesce_key: 相同 key 的写操作仍在排队时只执行最后一个，所有调用方都拿到它的结果
+
+    Raises:
+        fn 抛出的异常，或提交失败时的 sqlite3 异常
+    """
+    with span("db_write"):
+        return await _get_writer().submit(fn, args, coalesce_key)
+
+
+def close(timeout: float = 10.0):
+    """写完排队中的数据后关闭写线程和读连接池"""
+    global _writer, _read_pool
+    with _init_lock:
+        writer, _writer = _writer, None
+        read_pool, _read_pool = _read_pool, None
+    if writer is not None:
+        writer.stop(timeout)
+    if read_pool is not None:
+        read_pool.shutdown(wait=True)
@@ -0,0 +1,280 @@
+"""
+负载测试：启动本地桩 LLM 与 FastAPI 服务，按配置的流量配比并发压测
+输出各接口的 p50/p95/p99 延迟与吞吐
+
+用法（在 backend 目录下）:
+    python bench/load_test.py --concurrency 16 --requests 500
+    python bench/load_test.py --mix parse=1,list=4,get=4 --latency-ms 300
+    python bench/load_test.py --target http://127.0.0.1:8000   # 压测已运行的服务（仍需自行配置其 AI_API_URL）
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional
+
+import requests
+
+from stub_llm import start_stub_server, add_stub_arguments, config_from_args
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+DEFAULT_MIX = "register=1,login=2,parse=2,advice=1,create=3,list=6,get=6,update=3,delete=1"
+
+RESUME_DATA = {
+    "name": "Zhang San",
+    "email": "zhangsan@example.com",
+    "phone": "13800000000",
+    "education": "Tsinghua University, Computer Science, 2022-09 ~ 2025-06",
+    "experience": "Example Tech, Backend Intern, 2024-06 ~ 2024-09",
+    "campusExperience": "Student Union, Minister",
+    "skills": "Python, Go, SQL",
+}
+
+
+def parse_mix(spec: str) -> List[Tuple[str, int]]:
+    mix = []
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        mix.append((name.strip(), int(weight or 1)))
+    return mix
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Client:
+    """单个虚拟用户：持有登录态和自己的简历 ID"""
+
+    def __init__(self, base_url: str, corpus: List[Tuple[str, bytes]]):
+        self.base_url = base_url
+        self.corpus = corpus
+        self.session = requests.Session()
+        suffix = uuid.uuid4().hex[:12]
+        self.username = f"bench_{suffix}"
+        self.email = f"bench_{suffix}@example.com"
+        self.password = "bench-password"
+        self.resume_ids: List[int] = []
+        self.lock = threading.Lock()
+
+    def _auth(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def register(self) -> requests.Response:
+        response = self.session.post(f"{self.base_url}/api/auth/register", json={
+            "username": self.username, "email": self.email, "password": self.password,
+        })
+        if response.ok:
+            self.token = response.json()["access_token"]
+        return response
+
+    def login(self) -> requests.Response:
+        response = self.session.post(f"{self.base_url}/api/auth/login", json={
+            "email": self.email, "password": self.password,
+        })
+        if response.ok:
+            self.token = response.json()["access_token"]
+        return response
+
+    def _upload(self, path: str) -> requests.Response:
+        filename, content = random.choice(self.corpus)
+        return self.session.post(f"{self.base_url}{path}", headers=self._auth(),
+                                 files={"file": (filename, content)})
+
+    def parse(self) -> requests.Response:
+        return self._upload("/api/parse-resume")
+
+    def advice(self) -> requests.Response:
+        return self._upload("/api/resume-advice")
+
+    def create(self) -> requests.Response:
+        response = self.session.post(f"{self.base_url}/api/resumes", headers=self._auth(), json=RESUME_DATA)
+        if response.ok:
+            with self.lock:
+                self.resume_ids.append(response.json()["id"])
+        return response
+
+    def list(self) -> requests.Response:
+        return self.session.get(f"{self.base_url}/api/resumes", headers=self._auth())
+
+    def _pick_resume(self) -> Optional[int]:
+        with self.lock:
+            return random.choice(self.resume_ids) if self.resume_ids else None
+
+    def get(self) -> requests.Response:
+        resume_id = self._pick_resume()
+        if resume_id is None:
+            return self.create()
+        return self.session.get(f"{self.base_url}/api/resumes/{resume_id}", headers=self._auth())
+
+    def update(self) -> requests.Response:
+        resume_id = self._pick_resume()
+        if resume_id is None:
+            return self.create()
+        data = dict(RESUME_DATA, skills=f"Python, Go, SQL, {uuid.uuid4().hex[:6]}")
+        return self.session.put(f"{self.base_url}/api/resumes/{resume_id}", headers=self._auth(), json=data)
+
+    def delete(self) -> requests.Response:
+        with self.lock:
+            resume_id = self.resume_ids.pop() if self.resume_ids else None
+        if resume_id is None:
+            return self.create()
+        return self.session.delete(f"{self.base_url}/api/resumes/{resume_id}", headers=self._auth())
+
+
+def start_app(port: int, llm_url: str, workdir: str, use_cache: bool = False) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "AI_API_URL": llm_url,
+        # 所有持久化数据都放在临时目录，每次压测从空状态开始
+        "DATABASE_PATH": os.path.join(workdir, "bench.db"),
+        "SHARED_STATE_PATH": os.path.join(workdir, "shared_state.db"),
+        "BLOB_DIR": os.path.join(workdir, "blobs"),
+        "PROFILE_DIR": os.path.join(workdir, "profiles"),
+        # 虚拟用户的请求量远超默认配额，压测时关闭配额
+        "QUOTA_ENABLED": "0",
+        # 语料只有几个文件，默认关闭解析缓存，否则 parse / advice 测到的是缓存命中
+        "PARSE_CACHE_TTL": env.get("PARSE_CACHE_TTL", "86400") if use_cache else "0",
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "resume_parser:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def wait_until_healthy(base_url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).ok:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"服务未在 {timeout}s 内就绪: {base_url}")
+
+
+def load_corpus() -> List[Tuple[str, bytes]]:
+    corpus = []
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        with open(os.path.join(CORPUS_DIR, name), "rb") as f:
+            corpus.append((name, f.read()))
+    return corpus
+
+
+def run(base_url: str, concurrency: int, total_requests: int, mix: List[Tuple[str, int]]):
+    corpus = load_corpus()
+    clients = [Client(base_url, corpus) for _ in range(concurrency)]
+
+    # 预热：每个虚拟用户先注册并创建一条简历
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda c: (c.register(), c.create()), clients))
+
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    results_lock = threading.Lock()
+    counter = iter(range(total_requests))
+    counter_lock = threading.Lock()
+
+    def worker(client: Client):
+        while True:
+            with counter_lock:
+                if next(counter, None) is None:
+                    return
+            op = random.choices(names, weights)[0]
+            if op == "register":
+                # 注册新账号会替换当前虚拟用户的身份
+                client.username = f"bench_{uuid.uuid4().hex[:12]}"
+                client.email = f"{client.username}@example.com"
+                client.resume_ids = []
+            start = time.perf_counter()
+            try:
+                ok = getattr(client, op)().ok
+            except requests.exceptions.RequestException:
+                ok = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with results_lock:
+                latencies[op].append(elapsed_ms)
+                if not ok:
+                    errors[op] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, clients))
+    wall = time.perf_counter() - start
+
+    report(latencies, errors, wall, concurrency)
+
+
+def report(latencies: Dict[str, List[float]], errors: Dict[str, int], wall: float, concurrency: int):
+    header = f"{'endpoint':<10}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}"
+    print(header)
+    print("-" * len(header))
+    all_values: List[float] = []
+    for op in sorted(latencies):
+        values = sorted(latencies[op])
+        all_values.extend(values)
+        print(f"{op:<10}{len(values):>8}{errors[op]:>8}{percentile(values, 50):>10.1f}"
+              f"{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}{len(values) / wall:>10.1f}")
+    all_values.sort()
+    print("-" * len(header))
+    print(f"{'total':<10}{len(all_values):>8}{sum(errors.values()):>8}{percentile(all_values, 50):>10.1f}"
+          f"{percentile(all_values, 95):>10.1f}{percentile(all_values, 99):>10.1f}{len(all_values) / wall:>10.1f}")
+    print(f"\nconcurrency={concurrency} wall={wall:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CVFiller 负载测试")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="总请求数（不含预热）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="流量配比，如 parse=2,list=6")
+    parser.add_argument("--target", help="压测已运行的服务，不再启动本地服务与桩 LLM")
+    parser.add_argument("--port", type=int, default=8765, help="本地启动服务时使用的端口")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--use-cache", action="store_true", help="启用解析结果缓存（默认关闭，测的是 LLM 路径）")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    mix = parse_mix(args.mix)
+
+    if args.target:
+        run(args.target.rstrip("/"), args.concurrency, args.requests, mix)
+        return
+
+    stub = start_stub_server(config_from_args(args))
+    stub_host, stub_port = stub.server_address[:2]
+    llm_url = f"http://{stub_host}:{stub_port}/v1/chat/completions"
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = start_app(args.port, llm_url, workdir, args.use_cache)
+        try:
+            wait_until_healthy(base_url)
+            run(base_url, args.concurrency, args.requests, mix)
+        finally:
+            app.terminate()
+            app.wait(timeout=10)
+            stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
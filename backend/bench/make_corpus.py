@@ -0,0 +1,151 @@
+"""
+生成基准测试用的样例简历语料（PDF / DOCX）
+只依赖标准库，生成结果提交在 bench/corpus 下；修改内容后重新运行本脚本即可
+"""
+
+import os
+import zipfile
+from typing import List
+from xml.sax.saxutils import escape
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+SECTIONS = {
+    "header": [
+        "Zhang San",
+        "Phone: 138-0000-0000  Email: zhangsan@example.com",
+    ],
+    "education": [
+        "EDUCATION",
+        "2022-09 - 2025-06  Tsinghua University  Computer Science  Master",
+        "2018-09 - 2022-06  Wuhan University  Software Engineering  Bachelor  GPA 3.8/4.0",
+    ],
+    "work": [
+        "WORK EXPERIENCE",
+        "2024-06 - 2024-09  Example Tech Co., Ltd.  Backend Development Intern",
+        "- Built order service APIs with FastAPI, Redis and MySQL serving 2M requests/day.",
+        "- Reduced p99 latency from 480ms to 290ms by batching cache lookups.",
+        "- Wrote integration tests raising coverage from 45% to 78%.",
+    ],
+    "projects": [
+        "PROJECTS",
+        "2023-03 - 2023-12  Campus Trading Platform  Tech Lead",
+        "- Led a team of 4 to build a second-hand trading platform for 5000+ students.",
+        "- Designed the search service on Elasticsearch; median query time 35ms.",
+    ],
+    "campus": [
+        "CAMPUS EXPERIENCE",
+        "2019-09 - 2020-06  Student Union  Minister of Technology",
+        "- Organised the campus tech festival with 800 participants.",
+    ],
+    "skills": [
+        "SKILLS",
+        "Python, Go, SQL, Redis, Docker, Kubernetes, CET-6, Linux",
+    ],
+}
+
+
+def _resume_lines(repeat: int) -> List[str]:
+    """repeat 控制工作/项目段落重复次数，用于构造不同长度的简历"""
+    lines = SECTIONS["header"] + [""] + SECTIONS["education"] + [""]
+    for i in range(repeat):
+        lines += SECTIONS["work"] + [""] + SECTIONS["projects"] + [""]
+    lines += SECTIONS["campus"] + [""] + SECTIONS["skills"]
+    return lines
+
+
+def write_pdf(path: str, lines: List[str], lines_per_page: int = 45):
+    """写一个最小可用的多页 PDF（Helvetica 字体，仅 ASCII 文本）"""
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # 占位，最后填充
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_lines in pages:
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 800 Td"]
+        for line in page_lines:
+            text = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({text}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, font_id, content_id)
+        ))
+
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref_offset
+    )
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, lines: List[str]):
+    """写一个最小可用的 DOCX（docx2txt 读取 word/document.xml）"""
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/>'
+        '</Relationships>'
+    )
+    paragraphs = "".join(f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(line)}</w:t></w:r></w:p>"
+                         for line in lines)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{paragraphs}</w:body></w:document>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", content_types)
+        zf.writestr("_rels/.rels", rels)
+        zf.writestr("word/document.xml", document)
+
+
+# 名称 -> 工作/项目段落重复次数
+CORPUS = {
+    "short": 1,
+    "medium": 3,
+    "long": 8,
+}
+
+
+if __name__ == "__main__":
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    for name, repeat in CORPUS.items():
+        lines = _resume_lines(repeat)
+        write_pdf(os.path.join(CORPUS_DIR, f"resume_{name}.pdf"), lines)
+        write_docx(os.path.join(CORPUS_DIR, f"resume_{name}.docx"), lines)
+        print(f"wrote resume_{name}.pdf / resume_{name}.docx ({len(lines)} lines)")
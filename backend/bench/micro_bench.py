@@ -0,0 +1,83 @@
+"""
+微基准：文本提取函数与 database.py 各函数
+在 bench/corpus 样例简历和临时数据库上运行，输出每次调用的平均与分位耗时
+
+用法（在 backend 目录下）:
+    python bench/micro_bench.py --repeat 50
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from resume_parser import extract_text_from_pdf, extract_text_from_docx
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+RESUME_DATA = {
+    "name": "Zhang San",
+    "email": "zhangsan@example.com",
+    "phone": "13800000000",
+    "education": "Tsinghua University, Computer Science, 2022-09 ~ 2025-06",
+    "experience": "Example Tech, Backend Intern, 2024-06 ~ 2024-09",
+    "campusExperience": "Student Union, Minister",
+    "skills": "Python, Go, SQL",
+}
+
+
+def bench(name: str, fn: Callable[[int], object], repeat: int):
+    """fn 接收迭代序号，便于生成不重复的输入"""
+    fn(-1)  # 预热
+    timings: List[float] = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    p50 = timings[len(timings) // 2]
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{name:<40}{repeat:>7}{mean:>10.3f}{p50:>10.3f}{p95:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CVFiller 微基准")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    repeat = args.repeat
+
+    print(f"{'benchmark':<40}{'n':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print("-" * 77)
+
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        path = os.path.join(CORPUS_DIR, filename)
+        if filename.endswith(".pdf"):
+            bench(f"extract_text_from_pdf[{filename}]", lambda i: extract_text_from_pdf(path), repeat)
+        elif filename.endswith(".docx"):
+            bench(f"extract_text_from_docx[{filename}]", lambda i: extract_text_from_docx(path), repeat)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database.DATABASE_PATH = os.path.join(workdir, "bench.db")
+        database.init_database()
+
+        bench("create_user", lambda i: database.create_user(f"u{i}", f"u{i}@example.com", "pw"), repeat)
+        bench("authenticate_user", lambda i: database.authenticate_user("u0@example.com", "pw"), repeat)
+        user_id = database.authenticate_user("u0@example.com", "pw")["id"]
+        bench("get_user_by_id", lambda i: database.get_user_by_id(user_id), repeat)
+
+        resume_ids: List[int] = []
+        bench("save_resume", lambda i: resume_ids.append(database.save_resume(user_id, RESUME_DATA, "a.pdf")), repeat)
+        bench("update_resume", lambda i: database.update_resume(resume_ids[i], user_id, RESUME_DATA), repeat)
+        bench("get_user_resumes", lambda i: database.get_user_resumes(user_id), repeat)
+        bench("get_resume_by_id", lambda i: database.get_resume_by_id(resume_ids[i], user_id), repeat)
+        bench("delete_resume", lambda i: database.delete_resume(resume_ids[i], user_id), repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+本地 OpenAI 兼容 chat/completions 桩服务
+用于基准测试，可配置延迟、流式输出、错误率和非法 JSON 比例
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any
+
+PARSED_RESUME = {
+    "personal_info": {"name": "Zhang San", "phone": "13800000000", "email": "zhangsan@example.com"},
+    "education": [
+        {"school": "Tsinghua University", "major": "Computer Science", "degree": "Master",
+         "start_date": "2022-09", "end_date": "2025-06"},
+        {"school": "Wuhan University", "major": "Software Engineering", "degree": "Bachelor",
+         "start_date": "2018-09", "end_date": "2022-06"},
+    ],
+    "work_experience": [
+        {"company": "Example Tech", "position": "Backend Intern", "start_date": "2024-06",
+         "end_date": "2024-09", "description": "Built order service APIs with FastAPI and Redis.",
+         "achievements": ["Cut p99 latency by 40%"], "tech_stack": ["Python", "FastAPI", "Redis"]},
+    ],
+    "projects": [
+        {"name": "Campus Trading Platform", "role": "Lead", "start_date": "2023-03",
+         "end_date": "2023-12", "description": "Second-hand trading platform for 5000+ students.",
+         "achievements": ["5000+ registered users"], "tech_stack": ["React", "Go"]},
+    ],
+    "campus_experience": [
+        {"organization": "Student Union", "role": "Minister", "start_date": "2019-09",
+         "end_date": "2020-06", "description": "Organised campus tech festival."},
+    ],
+    "skills_certifications": {"skills": ["Python", "Go", "SQL", "CET-6"]},
+}
+
+RESUME_ADVICE = {
+    "score": 82,
+    "summary": "Solid technical background; quantify more outcomes.",
+    "strengths": ["Relevant internship", "Clear education history", "Concrete tech stack"],
+    "improvements": [
+        {"section": "Projects", "issue": "Lacks measurable results",
+         "suggestion": "Add metrics such as user count or latency gains."},
+    ],
+    "action_items": ["Quantify project results", "Trim skills list", "Add GitHub link"],
+}
+
+
+class StubConfig:
+    """桩服务的运行参数，可在运行中修改"""
+
+    def __init__(self, latency_ms: float = 800, jitter_ms: float = 200, error_rate: float = 0.0,
+                 malformed_rate: float = 0.0, stream_chunk_ms: float = 20):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.stream_chunk_ms = stream_chunk_ms
+
+
+def _pick_content(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """根据 system prompt 判断是解析请求还是建议请求"""
+    messages = payload.get("messages") or [{}]
+    system_prompt = messages[0].get("content", "")
+    if "修改建议" in system_prompt or '"score"' in system_prompt:
+        return RESUME_ADVICE
+    return PARSED_RESUME
+
+
+def make_handler(config: StubConfig):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, body: Dict[str, Any]):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+
+            delay = max(0.0, config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms))
+            time.sleep(delay / 1000)
+
+            if random.random() < config.error_rate:
+                self._send_json(503, {"error": {"message": "stub upstream overloaded"}})
+                return
+
+            content = json.dumps(_pick_content(payload), ensure_ascii=False)
+            if random.random() < config.malformed_rate:
+                # 截断输出，模拟模型返回不完整 JSON
+                content = content[: len(content) // 2]
+
+            prompt_tokens = sum(len(m.get("content", "")) for m in payload.get("messages", [])) // 2
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 2,
+                "total_tokens": prompt_tokens + len(content) // 2,
+            }
+            model = payload.get("model", "stub")
+
+            if payload.get("stream"):
+                self._stream(content, model)
+                return
+
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        def _stream(self, content: str, model: str):
+            """以 SSE 分块返回，每块间隔 stream_chunk_ms"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            chunk_size = 32
+            for i in range(0, len(content), chunk_size):
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": content[i:i + chunk_size]}}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(config.stream_chunk_ms / 1000)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return StubHandler
+
+
+def start_stub_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程启动桩服务，返回 server（server.server_address 为实际监听地址）"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=800, help="模拟上游平均延迟")
+    parser.add_argument("--jitter-ms", type=float, default=200, help="延迟抖动范围")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的比例")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="返回截断 JSON 的比例")
+    parser.add_argument("--stream-chunk-ms", type=float, default=20, help="流式输出每块间隔")
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        stream_chunk_ms=args.stream_chunk_ms,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config_from_args(args)))
+    print(f"stub LLM listening on http://{args.host}:{args.port}/v1/chat/completions")
+    server.serve_forever()
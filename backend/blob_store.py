@@ -0,0 +1,180 @@
+"""
+原始简历文件存储
+按 SHA-256 内容寻址保存在本地磁盘，相同文件（包括不同用户上传的）只存一份；
+引用计数来自 resumes 表中引用该哈希的行数，无引用且超过保留期的文件由 collect_garbage 清理
+"""
+
+import os
+import re
+import hashlib
+import tempfile
+import mimetypes
+from urllib.parse import quote
+from typing import Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+
+from database import register_blob, get_unreferenced_blobs, delete_blob_record
+from tracing import get_logger
+
+BLOB_DIR = os.environ.get("BLOB_DIR", "./data/blobs")
+# 无引用的文件至少保留多久（秒），给“解析后再保存”留出时间
+BLOB_GC_GRACE_SECONDS = int(os.environ.get("BLOB_GC_GRACE_SECONDS", "86400"))
+
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+_CHUNK_SIZE = 256 * 1024
+
+log = get_logger("blob")
+
+
+def blob_path(sha256: str) -> str:
+    """按哈希前两位分目录，避免单目录文件过多"""
+    return os.path.join(BLOB_DIR, sha256[:2], sha256)
+
+
+def is_valid_sha256(value: str) -> bool:
+    return bool(value) and bool(_SHA256_PATTERN.match(value))
+
+
+def has_blob(sha256: str) -> bool:
+    return is_valid_sha256(sha256) and os.path.exists(blob_path(sha256))
+
+
+def put_blob(data: bytes, sha256: Optional[str] = None, user_id: Optional[int] = None) -> str:
+    """
+    保存文件内容，已存在时直接返回；写临时文件后原子重命名，并发写入同一内容也安全
+
+    Args:
+        user_id: 上传者，之后只有上传过该文件的用户可以把它关联到简历
+    """
+    sha256 = sha256 or hashlib.sha256(data).hexdigest()
+    path = blob_path(sha256)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    register_blob(sha256, len(data), user_id)
+    return sha256
+
+
+def collect_garbage(grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> int:
+    """删除没有任何简历引用且超过保留期的文件，返回删除数量"""
+    removed = 0
+    for sha256 in get_unreferenced_blobs(grace_seconds):
+        try:
+            os.unlink(blob_path(sha256))
+        except FileNotFoundError:
+            pass
+        delete_blob_record(sha256)
+        removed += 1
+    log.info("文件清理完成", extra={"fields": {"removed": removed}})
+    return removed
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range 头，返回 [start, end) 区间；多段或格式不支持时返回 None（发送完整文件）
+
+    Raises:
+        ValueError: 区间不可满足（416）
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, _, end_text = range_header[6:].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) + 1 if end_text else size
+        else:
+            # bytes=-N 表示最后 N 个字节
+            start = max(0, size - int(end_text))
+            end = size
+    except ValueError:
+        return None
+    end = min(end, size)
+    if start >= end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+class BlobResponse(Response):
+    """
+    发送已存储的文件，支持单段 HTTP Range
+
+    在线程池中按块读取发送；服务器提供 ASGI http.response.zerocopysend 扩展时改由其零拷贝发送
+    （uvicorn 不实现该扩展）
+    """
+
+    def __init__(self, sha256: str, filename: Optional[str] = None, range_header: Optional[str] = None):
+        self.path = blob_path(sha256)
+        size = os.stat(self.path).st_size
+        media_type = mimetypes.guess_type(filename or "")[0] or "application/octet-stream"
+        super().__init__(media_type=media_type)
+
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            self.status_code = 416
+            self.offset, self.count = 0, 0
+            self.headers["Content-Range"] = f"bytes */{size}"
+            self.headers["Content-Length"] = "0"
+            return
+
+        self.offset, end = byte_range or (0, size)
+        self.count = end - self.offset
+        if byte_range:
+            self.status_code = 206
+            self.headers["Content-Range"] = f"bytes {self.offset}-{end - 1}/{size}"
+        self.headers["Content-Length"] = str(self.count)
+        self.headers["Accept-Ranges"] = "bytes"
+        # 内容寻址，同一 URL 对应的内容不会变化
+        self.headers["ETag"] = f'"{sha256}"'
+        self.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+        if filename:
+            self.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.count == 0 or scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.offset,
+                    "count": self.count,
+                })
+                return
+
+            fd = f.fileno()
+            offset, remaining = self.offset, self.count
+            while remaining > 0:
+                chunk = await run_in_threadpool(os.pread, fd, min(_CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+
+if __name__ == "__main__":
+    import sys
+    from database import init_database
+
+    if sys.argv[1:] != ["gc"]:
+        print("用法: python blob_store.py gc")
+        sys.exit(1)
+    init_database()
+    print(f"removed {collect_garbage()} unreferenced blobs")
@@ -0,0 +1,109 @@
+"""
+响应压缩与快速 JSON 序列化
+CompressionMiddleware 按 Accept-Encoding 对超过阈值的一次性响应做 br / gzip 压缩；
+FastJSONResponse 使用 orjson 序列化，热点接口直接返回它以跳过 FastAPI 的逐层编码
+"""
+
+import gzip
+from typing import Any, Optional
+
+import orjson
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli 不可用时只提供 gzip
+    brotli = None
+
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def parse_accept_encoding(value: str) -> set:
+    """解析 Accept-Encoding，忽略 q=0 的编码"""
+    encodings = set()
+    for item in value.split(","):
+        token, _, params = item.strip().partition(";")
+        if not token:
+            continue
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(token.strip().lower())
+    return encodings
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson 序列化的 JSON 响应"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class CompressionMiddleware:
+    """
+    ASGI 响应压缩中间件
+
+    只压缩一次性发送完的响应体；流式响应、已带 Content-Encoding 的响应（如预压缩静态文件）
+    和非文本类型原样透传
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = parse_accept_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[dict] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or message.get("more_body", False):
+                # 流式响应或其他扩展消息：不压缩
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            if (
+                len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_CONTENT_TYPES)
+            ):
+                await send(start_message)
+                await send(message)
+                return
+
+            if encoding == "br":
+                body = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(body, compresslevel=self.gzip_level)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -7,12 +7,20 @@ import os
 import sqlite3
 import hashlib
 import secrets
+import threading
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterable, Iterator
 from contextlib import contextmanager
 
+from tracing import get_logger, span
+
+log = get_logger("db")
+
 DATABASE_PATH = os.environ.get("DATABASE_PATH", "./data/cvfiller.db")
 
+# 读连接池线程绑定的长连接
+_thread_local = threading.local()
+
 
 def init_database():
     """初始化数据库表结构"""
@@ -20,6 +28,9 @@ def init_database():
     os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
     
     with get_db() as db:
+        # WAL 模式允许多个 worker 进程并发读写
+        db.execute('PRAGMA journal_mode=WAL')
+        
         # 用户表
         db.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -46,29 +57,94 @@ def init_database():
                 campus_experience TEXT,
                 skills TEXT,
                 source_filename TEXT,
+                source_sha256 TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
             )
         ''')
         
+        # 旧库迁移：原始文件哈希列。多个 worker 同时启动，检查和 ALTER 须在同一写事务内
+        db.execute('BEGIN IMMEDIATE')
+        columns = {row["name"] for row in db.execute('PRAGMA table_info(resumes)')}
+        if "source_sha256" not in columns:
+            db.execute('ALTER TABLE resumes ADD COLUMN source_sha256 TEXT')
+        db.commit()
+        
+        # 原始文件（内容寻址），引用数由 resumes.source_sha256 统计
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID
+        ''')
+        
+        # 用户上传过哪些文件，创建简历时只允许关联自己上传的文件
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS user_blobs (
+                user_id INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, sha256)
+            ) WITHOUT ROWID
+        ''')
+        
+        # LLM 用量按 用户 / 接口 / 天 聚合，每组只占一行
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                user_id INTEGER NOT NULL,
+                endpoint TEXT NOT NULL,
+                day TEXT NOT NULL,
+                requests INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, endpoint, day)
+            ) WITHOUT ROWID
+        ''')
+        
         # 创建索引
         db.execute('CREATE INDEX IF NOT EXISTS idx_resumes_user_id ON resumes(user_id)')
         db.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_resumes_source_sha256 ON resumes(source_sha256)')
         
         db.commit()
-        print(f"[DB] 数据库初始化完成: {DATABASE_PATH}")
+        log.info("数据库初始化完成", extra={"fields": {"path": DATABASE_PATH}})
+
+
+def connect(autocommit: bool = False, readonly: bool = False) -> sqlite3.Connection:
+    """
+    打开数据库连接
+
+    Args:
+        autocommit: 不自动开启事务，由调用方显式 BEGIN / SAVEPOINT / COMMIT
+        readonly: 只读连接，误执行写操作时报错
+    """
+    conn = sqlite3.connect(DATABASE_PATH, timeout=30, isolation_level=None if autocommit else "")
+    conn.row_factory = sqlite3.Row
+    if readonly:
+        conn.execute('PRAGMA query_only = ON')
+    return conn
+
+
+def bind_thread_connection(conn: Optional[sqlite3.Connection]):
+    """为当前线程绑定长连接，之后该线程内的 get_db 复用它而不是每次新建"""
+    _thread_local.conn = conn
 
 
 @contextmanager
 def get_db():
     """获取数据库连接上下文管理器"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+    with span("db"):
+        conn = getattr(_thread_local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
 
 
 def hash_password(password: str, salt: Optional[str] = None) -> tuple:
@@ -87,31 +163,38 @@ def verify_password(password: str, password_hash: str, salt: str) -> bool:
 
 # ========== 用户相关操作 ==========
 
+def insert_user(db: sqlite3.Connection, username: str, email: str, password_hash: str,
+                salt: str) -> Dict[str, Any]:
+    """在给定连接上插入用户（不提交）"""
+    try:
+        cursor = db.execute(
+            '''INSERT INTO users (username, email, password_hash, salt)
+               VALUES (?, ?, ?, ?)''',
+            (username, email, password_hash, salt)
+        )
+    except sqlite3.IntegrityError as e:
+        if "username" in str(e).lower():
+            raise ValueError("用户名已被使用")
+        elif "email" in str(e).lower():
+            raise ValueError("邮箱已被注册")
+        raise ValueError("用户已存在")
+    
+    return {
+        "id": cursor.lastrowid,
+        "username": username,
+        "email": email,
+        "created_at": datetime.now().isoformat()
+    }
+
+
 def create_user(username: str, email: str, password: str) -> Dict[str, Any]:
     """创建新用户"""
     password_hash, salt = hash_password(password)
     
     with get_db() as db:
-        try:
-            cursor = db.execute(
-                '''INSERT INTO users (username, email, password_hash, salt)
-                   VALUES (?, ?, ?, ?)''',
-                (username, email, password_hash, salt)
-            )
-            db.commit()
-            
-            return {
-                "id": cursor.lastrowid,
-                "username": username,
-                "email": email,
-                "created_at": datetime.now().isoformat()
-            }
-        except sqlite3.IntegrityError as e:
-            if "username" in str(e).lower():
-                raise ValueError("用户名已被使用")
-            elif "email" in str(e).lower():
-                raise ValueError("邮箱已被注册")
-            raise ValueError("用户已存在")
+        user = insert_user(db, username, email, password_hash, salt)
+        db.commit()
+        return user
 
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
@@ -158,55 +241,71 @@ def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
 
 # ========== 简历数据相关操作 ==========
 
-def save_resume(user_id: int, resume_data: Dict[str, Any], source_filename: str = None) -> int:
+def insert_resume(db: sqlite3.Connection, user_id: int, resume_data: Dict[str, Any],
+                  source_filename: str = None, source_sha256: str = None) -> int:
+    """在给定连接上插入简历（不提交）"""
+    cursor = db.execute('''
+        INSERT INTO resumes 
+        (user_id, name, email, phone, education, experience, campus_experience, skills, source_filename,
+         source_sha256)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        user_id,
+        resume_data.get("name", ""),
+        resume_data.get("email", ""),
+        resume_data.get("phone", ""),
+        resume_data.get("education", ""),
+        resume_data.get("experience", ""),
+        resume_data.get("campusExperience", ""),
+        resume_data.get("skills", ""),
+        source_filename,
+        source_sha256
+    ))
+    return cursor.lastrowid
+
+
+def save_resume(user_id: int, resume_data: Dict[str, Any], source_filename: str = None,
+                source_sha256: str = None) -> int:
     """保存简历数据"""
     with get_db() as db:
-        cursor = db.execute('''
-            INSERT INTO resumes 
-            (user_id, name, email, phone, education, experience, campus_experience, skills, source_filename)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id,
-            resume_data.get("name", ""),
-            resume_data.get("email", ""),
-            resume_data.get("phone", ""),
-            resume_data.get("education", ""),
-            resume_data.get("experience", ""),
-            resume_data.get("campusExperience", ""),
-            resume_data.get("skills", ""),
-            source_filename
-        ))
+        resume_id = insert_resume(db, user_id, resume_data, source_filename, source_sha256)
         db.commit()
-        return cursor.lastrowid
+        return resume_id
+
+
+def update_resume_row(db: sqlite3.Connection, resume_id: int, user_id: int, resume_data: Dict[str, Any]) -> bool:
+    """在给定连接上更新简历（不提交）"""
+    cursor = db.execute('''
+        UPDATE resumes SET
+            name = ?,
+            email = ?,
+            phone = ?,
+            education = ?,
+            experience = ?,
+            campus_experience = ?,
+            skills = ?,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND user_id = ?
+    ''', (
+        resume_data.get("name", ""),
+        resume_data.get("email", ""),
+        resume_data.get("phone", ""),
+        resume_data.get("education", ""),
+        resume_data.get("experience", ""),
+        resume_data.get("campusExperience", ""),
+        resume_data.get("skills", ""),
+        resume_id,
+        user_id
+    ))
+    return cursor.rowcount > 0
 
 
 def update_resume(resume_id: int, user_id: int, resume_data: Dict[str, Any]) -> bool:
     """更新简历数据"""
     with get_db() as db:
-        cursor = db.execute('''
-            UPDATE resumes SET
-                name = ?,
-                email = ?,
-                phone = ?,
-                education = ?,
-                experience = ?,
-                campus_experience = ?,
-                skills = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ? AND user_id = ?
-        ''', (
-            resume_data.get("name", ""),
-            resume_data.get("email", ""),
-            resume_data.get("phone", ""),
-            resume_data.get("education", ""),
-            resume_data.get("experience", ""),
-            resume_data.get("campusExperience", ""),
-            resume_data.get("skills", ""),
-            resume_id,
-            user_id
-        ))
+        updated = update_resume_row(db, resume_id, user_id, resume_data)
         db.commit()
-        return cursor.rowcount > 0
+        return updated
 
 
 def get_user_resumes(user_id: int) -> List[Dict[str, Any]]:
@@ -232,12 +331,143 @@ def get_resume_by_id(resume_id: int, user_id: int) -> Optional[Dict[str, Any]]:
         return None
 
 
+def iter_user_resumes(user_id: int, batch_size: int = 200) -> Iterator[Dict[str, Any]]:
+    """
+    按 id 游标分批读取用户的全部简历（含全部字段）
+
+    每批使用独立的短连接，内存占用只与 batch_size 有关，也不会长时间持有读事务
+    """
+    last_id = 0
+    while True:
+        with get_db() as db:
+            rows = db.execute('''
+                SELECT * FROM resumes WHERE user_id = ? AND id > ?
+                ORDER BY id LIMIT ?
+            ''', (user_id, last_id, batch_size)).fetchall()
+        
+        for row in rows:
+            yield dict(row)
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def import_resumes(user_id: int, resumes: Iterable[Dict[str, Any]], batch_size: int = 500) -> int:
+    """批量导入简历，分批 executemany，全部在一个事务内完成；任一条失败则整体回滚"""
+    sql = '''
+        INSERT INTO resumes
+        (user_id, name, email, phone, education, experience, campus_experience, skills, source_filename,
+         created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+    '''
+    count = 0
+    with get_db() as db:
+        batch = []
+        for resume_data in resumes:
+            batch.append((
+                user_id,
+                resume_data.get("name", ""),
+                resume_data.get("email", ""),
+                resume_data.get("phone", ""),
+                resume_data.get("education", ""),
+                resume_data.get("experience", ""),
+                # 兼容导出格式（campus_experience）和前端格式（campusExperience）
+                resume_data.get("campus_experience", resume_data.get("campusExperience", "")),
+                resume_data.get("skills", ""),
+                resume_data.get("source_filename"),
+                resume_data.get("created_at"),
+                resume_data.get("updated_at")
+            ))
+            if len(batch) >= batch_size:
+                db.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            db.executemany(sql, batch)
+            count += len(batch)
+        db.commit()
+    return count
+
+
+def delete_resume_row(db: sqlite3.Connection, resume_id: int, user_id: int) -> bool:
+    """在给定连接上删除简历（不提交）"""
+    cursor = db.execute(
+        'DELETE FROM resumes WHERE id = ? AND user_id = ?',
+        (resume_id, user_id)
+    )
+    return cursor.rowcount > 0
+
+
 def delete_resume(resume_id: int, user_id: int) -> bool:
     """删除简历"""
     with get_db() as db:
-        cursor = db.execute(
-            'DELETE FROM resumes WHERE id = ? AND user_id = ?',
-            (resume_id, user_id)
-        )
+        deleted = delete_resume_row(db, resume_id, user_id)
+        db.commit()
+        return deleted
+
+
+# ========== 用量统计 ==========
+
+def upsert_llm_usage(db: sqlite3.Connection, user_id: int, endpoint: str, prompt_tokens: int,
+                     completion_tokens: int):
+    """在给定连接上累加用量（不提交）"""
+    db.execute('''
+        INSERT INTO llm_usage (user_id, endpoint, day, requests, prompt_tokens, completion_tokens)
+        VALUES (?, ?, date('now'), 1, ?, ?)
+        ON CONFLICT (user_id, endpoint, day) DO UPDATE SET
+            requests = requests + 1,
+            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+            completion_tokens = completion_tokens + excluded.completion_tokens
+    ''', (user_id, endpoint, prompt_tokens, completion_tokens))
+
+
+def get_user_usage(user_id: int, days: int = 30) -> List[Dict[str, Any]]:
+    """获取用户最近 days 天的用量"""
+    with get_db() as db:
+        rows = db.execute('''
+            SELECT endpoint, day, requests, prompt_tokens, completion_tokens
+            FROM llm_usage WHERE user_id = ? AND day >= date('now', ?)
+            ORDER BY day DESC, endpoint
+        ''', (user_id, f"-{days} days")).fetchall()
+        
+        return [dict(row) for row in rows]
+
+
+# ========== 原始文件 ==========
+
+def register_blob(sha256: str, size: int, user_id: Optional[int] = None):
+    """登记已存储的原始文件（已登记时忽略），并记录上传者"""
+    with get_db() as db:
+        db.execute('INSERT OR IGNORE INTO blobs (sha256, size) VALUES (?, ?)', (sha256, size))
+        if user_id is not None:
+            db.execute('INSERT OR IGNORE INTO user_blobs (user_id, sha256) VALUES (?, ?)', (user_id, sha256))
+        db.commit()
+
+
+def user_uploaded_blob(user_id: int, sha256: str) -> bool:
+    """用户是否上传过该文件"""
+    with get_db() as db:
+        row = db.execute(
+            'SELECT 1 FROM user_blobs WHERE user_id = ? AND sha256 = ?',
+            (user_id, sha256)
+        ).fetchone()
+        return row is not None
+
+
+def get_unreferenced_blobs(grace_seconds: int) -> List[str]:
+    """没有任何简历引用、且登记时间早于 grace_seconds 之前的文件哈希"""
+    with get_db() as db:
+        rows = db.execute('''
+            SELECT sha256 FROM blobs
+            WHERE created_at < datetime('now', ?)
+              AND NOT EXISTS (SELECT 1 FROM resumes WHERE resumes.source_sha256 = blobs.sha256)
+        ''', (f"-{grace_seconds} seconds",)).fetchall()
+        
+        return [row["sha256"] for row in rows]
+
+
+def delete_blob_record(sha256: str):
+    with get_db() as db:
+        db.execute('DELETE FROM blobs WHERE sha256 = ?', (sha256,))
+        db.execute('DELETE FROM user_blobs WHERE sha256 = ?', (sha256,))
         db.commit()
-        return cursor.rowcount > 0
@@ -0,0 +1,56 @@
+"""
+延迟导入模块
+重量级可选依赖（PyMuPDF、docx2txt、requests 等）在首次使用时才导入，并记录每个模块的导入耗时
+"""
+
+import time
+import importlib
+import threading
+from types import ModuleType
+from typing import Dict, Iterable
+
+# 模块名 -> 导入耗时（毫秒）
+IMPORT_TIMINGS: Dict[str, float] = {}
+
+_import_lock = threading.Lock()
+
+
+def _import(name: str) -> ModuleType:
+    with _import_lock:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        IMPORT_TIMINGS.setdefault(name, round((time.perf_counter() - start) * 1000, 2))
+        return module
+
+
+class _LazyModule(ModuleType):
+    """模块代理：第一次访问属性时才真正导入"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            module = _import(self.__name__)
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> ModuleType:
+    """返回模块代理，首次访问属性时导入 name"""
+    return _LazyModule(name)
+
+
+def preload(names: Iterable[str]) -> Dict[str, float]:
+    """提前导入指定模块（用于启动预热），返回导入耗时"""
+    for name in names:
+        _import(name)
+    return dict(IMPORT_TIMINGS)
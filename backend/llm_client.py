@@ -0,0 +1,130 @@
+"""
+大模型 API 客户端
+复用连接池调用 OpenAI 兼容的 chat/completions 接口，记录进行中的调用数以便关闭时等待其完成
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any
+
+from lazy_imports import lazy_import
+from tracing import get_logger, span
+
+requests = lazy_import("requests")
+
+# 腾讯 Hunyuan 大模型 API 配置
+AI_API_KEY = os.environ.get("AI_API_KEY", "DecU74WXOm8RZ9AnD8F5Ea60AaDd4c4e9729031e302324Ba")
+AI_API_URL = os.environ.get("AI_API_URL", "https://tcamp.qq.com/openai/chat/completions")
+# 每个 worker 到上游的连接池大小
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "16"))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+
+log = get_logger("llm")
+
+_session = None
+_session_lock = threading.Lock()
+
+_inflight = 0
+_inflight_cond = threading.Condition()
+
+# 当前请求累计的 token 用量，由 usage_recorder 开启
+_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("llm_usage", default=None)
+
+
+def get_session():
+    """进程内共享的 requests.Session，保持到上游的长连接"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=LLM_POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {AI_API_KEY}"
+                })
+                _session = session
+    return _session
+
+
+def chat_completion(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    调用 chat/completions 接口
+
+    Returns:
+        上游返回的完整 JSON（含 choices 和 usage）
+    """
+    global _inflight
+    with _inflight_cond:
+        _inflight += 1
+    try:
+        with span("llm", model=payload.get("model")):
+            response = get_session().post(AI_API_URL, json=payload, timeout=LLM_TIMEOUT)
+            response.raise_for_status()
+            result = response.json()
+        _add_usage(result.get("usage"))
+        return result
+    finally:
+        with _inflight_cond:
+            _inflight -= 1
+            _inflight_cond.notify_all()
+
+
+def _add_usage(usage: Optional[Dict[str, Any]]):
+    totals = _usage.get()
+    if totals is None or not usage:
+        return
+    totals["calls"] += 1
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        totals[field] += int(usage.get(field) or 0)
+
+
+@contextmanager
+def usage_recorder():
+    """
+    统计 with 块内所有 chat_completion 调用的 token 用量（取自响应的 usage 字段）
+
+    Yields:
+        累计用量 dict：calls / prompt_tokens / completion_tokens / total_tokens
+    """
+    totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    token = _usage.set(totals)
+    try:
+        yield totals
+    finally:
+        _usage.reset(token)
+
+
+def warm_up():
+    """建立到上游的连接，放入连接池；上游不可达时只记录日志"""
+    try:
+        get_session().head(AI_API_URL, timeout=5)
+    except requests.exceptions.RequestException as e:
+        log.warning("上游连接预热失败", extra={"fields": {"error": str(e)}})
+
+
+def wait_for_idle(timeout: float) -> bool:
+    """等待进行中的 LLM 调用结束，返回是否在 timeout 内全部完成"""
+    deadline = time.monotonic() + timeout
+    with _inflight_cond:
+        if _inflight > 0:
+            log.info("等待进行中的 LLM 调用完成", extra={"fields": {"inflight": _inflight, "timeout": timeout}})
+        while _inflight > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                log.warning("关闭时仍有未完成的 LLM 调用", extra={"fields": {"inflight": _inflight}})
+                return False
+            _inflight_cond.wait(remaining)
+    return True
+
+
+def close():
+    global _session
+    if _session is not None:
+        _session.close()
+        _session = None
@@ -0,0 +1,238 @@
+"""
+模型级联路由
+先用最便宜、最快的模型调用，按输出结构和完整度打分，置信度不足时才升级到更大的模型；
+每一级的调用次数、结果和耗时累计在共享状态中，多 worker 间汇总
+"""
+
+import os
+import re
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from llm_client import chat_completion
+from prompts import PromptVersion, PARSE_SCHEMA, call_counters
+from shared_state import get_shared_state, incr_counters
+from tracing import get_logger
+
+# 逗号分隔的模型列表，按从小到大的顺序尝试；只配一个模型时不会升级
+PARSE_MODEL_CASCADE = [m.strip() for m in os.environ.get(
+    "PARSE_MODEL_CASCADE", "hunyuan-lite,hunyuan-standard").split(",") if m.strip()]
+ADVICE_MODEL_CASCADE = [m.strip() for m in os.environ.get(
+    "ADVICE_MODEL_CASCADE", "hunyuan-lite,hunyuan-standard").split(",") if m.strip()]
+# 输出置信度低于该值时升级到下一级模型
+CASCADE_MIN_CONFIDENCE = float(os.environ.get("CASCADE_MIN_CONFIDENCE", "0.7"))
+
+CASCADES: Dict[str, List[str]] = {
+    "parse": PARSE_MODEL_CASCADE,
+    "advice": ADVICE_MODEL_CASCADE,
+}
+
+# 每级模型的结果：accepted 置信度达标，escalated 不达标并交给下一级，
+# exhausted 最后一级仍不达标，failed 调用失败或输出不是合法 JSON
+OUTCOMES = ("accepted", "escalated", "exhausted", "failed")
+
+log = get_logger("router")
+
+
+# ========== 输出打分 ==========
+
+_PARSE_SCHEMA = {field: type(example) for field, example in PARSE_SCHEMA.items()}
+_DATED_SECTIONS = ("education", "work_experience", "projects", "campus_experience")
+
+# 简历文本中出现这些标题时（不区分大小写），对应字段不应为空
+_SECTION_HEADINGS = {
+    "education": ("教育背景", "教育经历", "Education"),
+    "work_experience": ("工作经历", "实习经历", "工作经验", "Work Experience", "Internship"),
+    "projects": ("项目经历", "项目经验", "Projects"),
+    "campus_experience": ("校园经历", "学生工作", "社团经历"),
+    "skills": ("专业技能", "技能", "Skills"),
+}
+
+_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+_TEXT_DATE_PATTERN = re.compile(r"(?:19|20)\d{2}\s*[./\-年]\s*\d{1,2}")
+_TEXT_EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_TEXT_PHONE_PATTERN = re.compile(r"(?<!\d)1[3-9]\d{9}(?!\d)")
+
+
+def _confidence(penalties: List[Tuple[str, float]]) -> Tuple[float, List[str]]:
+    return max(0.0, 1.0 - sum(weight for _, weight in penalties)), [issue for issue, _ in penalties]
+
+
+def score_parsed_resume(data: Any, resume_text: str) -> Tuple[float, List[str]]:
+    """
+    按期望的 JSON 结构和简历原文给解析结果打分
+
+    Returns:
+        (置信度 0~1, 问题列表)
+    """
+    if not isinstance(data, dict):
+        return 0.0, ["输出不是 JSON 对象"]
+
+    penalties = []
+    for field, expected_type in _PARSE_SCHEMA.items():
+        if not isinstance(data.get(field), expected_type):
+            penalties.append((f"{field} 缺失或类型错误", 0.3))
+
+    personal_info = data.get("personal_info") if isinstance(data.get("personal_info"), dict) else {}
+    if not personal_info.get("name"):
+        penalties.append(("缺少姓名", 0.3))
+    if _TEXT_EMAIL_PATTERN.search(resume_text) and not personal_info.get("email"):
+        penalties.append(("原文有邮箱但未提取", 0.15))
+    if _TEXT_PHONE_PATTERN.search(resume_text) and not personal_info.get("phone"):
+        penalties.append(("原文有手机号但未提取", 0.15))
+
+    lowered_text = resume_text.lower()
+    for field, headings in _SECTION_HEADINGS.items():
+        if field == "skills":
+            skills = data.get("skills_certifications")
+            value = skills.get("skills") if isinstance(skills, dict) else None
+        else:
+            value = data.get(field)
+        if not value and any(heading.lower() in lowered_text for heading in headings):
+            penalties.append((f"原文有“{headings[0]}”但 {field} 为空", 0.3))
+
+    # 原文有日期时，各条经历都应给出 YYYY-MM 格式的起止时间
+    if _TEXT_DATE_PATTERN.search(resume_text):
+        entries = [entry for field in _DATED_SECTIONS if isinstance(data.get(field), list)
+                   for entry in data[field] if isinstance(entry, dict)]
+        if entries:
+            undated = sum(1 for entry in entries if not _DATE_PATTERN.match(str(entry.get("start_date", ""))))
+            if undated:
+                penalties.append((f"{undated}/{len(entries)} 条经历缺少日期", 0.3 * undated / len(entries)))
+
+    return _confidence(penalties)
+
+
+def score_resume_advice(data: Any) -> Tuple[float, List[str]]:
+    """按期望的 JSON 结构给修改建议打分"""
+    if not isinstance(data, dict):
+        return 0.0, ["输出不是 JSON 对象"]
+
+    penalties = []
+    score = data.get("score")
+    if not isinstance(score, (int, float)) or not 0 <= score <= 100:
+        penalties.append(("score 缺失或超出 0-100", 0.3))
+    if not isinstance(data.get("summary"), str) or not data["summary"].strip():
+        penalties.append(("缺少 summary", 0.3))
+    if not isinstance(data.get("strengths"), list) or not data["strengths"]:
+        penalties.append(("缺少 strengths", 0.2))
+    improvements = data.get("improvements")
+    if not isinstance(improvements, list) or not improvements:
+        penalties.append(("缺少 improvements", 0.3))
+    elif not all(isinstance(item, dict) and item.get("suggestion") for item in improvements):
+        penalties.append(("improvements 条目缺少 suggestion", 0.2))
+    if not isinstance(data.get("action_items"), list):
+        penalties.append(("缺少 action_items", 0.1))
+
+    return _confidence(penalties)
+
+
+# ========== 路由 ==========
+
+def _metric_key(task: str, model: str, field: str) -> str:
+    return f"metrics:cascade:{task}:{model}:{field}"
+
+
+def _record(prompt: PromptVersion, model: str, outcome: str, elapsed_ms: float,
+            usage: Optional[Dict[str, Any]], success: bool, confidence: float = 0.0):
+    """记录一次模型调用的路由指标和 prompt 版本统计，合并为一次提交"""
+    task = prompt.task
+    counts = {
+        _metric_key(task, model, "calls"): 1,
+        _metric_key(task, model, outcome): 1,
+        _metric_key(task, model, "latency_ms"): int(elapsed_ms),
+        _metric_key(task, model, "confidence_milli"): int(confidence * 1000),
+    }
+    counts.update(call_counters(prompt, elapsed_ms, usage, success))
+    try:
+        incr_counters(counts)
+    except Exception:
+        log.exception("路由指标写入失败")
+
+
+def run_cascade(
+    prompt: PromptVersion,
+    resume_text: str,
+    parse_output: Callable[[Dict[str, Any]], Any],
+    score: Callable[[Any], Tuple[float, List[str]]],
+) -> Any:
+    """
+    按 CASCADES[prompt.task] 的顺序调用模型，返回第一个置信度达标的输出；
+    都不达标时返回置信度最高的输出
+
+    Args:
+        prompt: 本次请求使用的 prompt 版本，每次调用同时计入该版本的统计
+        resume_text: 简历文本
+        parse_output: 上游响应 -> 结构化输出，输出不合法时抛异常
+        score: 结构化输出 -> (置信度, 问题列表)
+
+    Raises:
+        所有模型都调用失败时，抛出最后一次的异常
+    """
+    task = prompt.task
+    models = CASCADES[task]
+    best = None
+    best_confidence = -1.0
+    last_error = None
+
+    for index, model in enumerate(models):
+        start = time.perf_counter()
+        result = None
+        try:
+            result = chat_completion(prompt.payload(model, resume_text))
+            output = parse_output(result)
+        except Exception as e:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _record(prompt, model, "failed", elapsed_ms, result and result.get("usage"), success=False)
+            log.warning("模型调用失败", extra={"fields": {
+                "task": task, "model": model, "prompt_version": prompt.version, "error": str(e)
+            }})
+            last_error = e
+            continue
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        confidence, issues = score(output)
+        accepted = confidence >= CASCADE_MIN_CONFIDENCE
+        is_last = index == len(models) - 1
+        outcome = "accepted" if accepted else "exhausted" if is_last else "escalated"
+        _record(prompt, model, outcome, elapsed_ms, result.get("usage"), accepted, confidence)
+        if accepted:
+            return output
+
+        log.info("模型输出置信度不足", extra={"fields": {
+            "task": task, "model": model, "prompt_version": prompt.version,
+            "confidence": round(confidence, 3), "issues": issues,
+            "escalate": not is_last,
+        }})
+        if confidence > best_confidence:
+            best, best_confidence = output, confidence
+
+    if best is not None:
+        return best
+    raise last_error
+
+
+def cascade_metrics() -> Dict[str, Any]:
+    """各任务、各级模型的累计路由指标（所有 worker 汇总）"""
+    state = get_shared_state()
+    report = {}
+    for task, models in CASCADES.items():
+        tiers = []
+        for model in models:
+            counts = {}
+            for field in ("calls", *OUTCOMES, "latency_ms", "confidence_milli"):
+                value = state.get(_metric_key(task, model, field))
+                counts[field] = int(value) if value is not None else 0
+            calls = counts.pop("calls")
+            latency_ms = counts.pop("latency_ms")
+            confidence_milli = counts.pop("confidence_milli")
+            scored = calls - counts["failed"]
+            tiers.append({
+                "model": model,
+                "calls": calls,
+                **counts,
+                "avg_latency_ms": round(latency_ms / calls, 1) if calls else None,
+                "avg_confidence": round(confidence_milli / scored / 1000, 3) if scored else None,
+            })
+        report[task] = tiers
+    return {"min_confidence": CASCADE_MIN_CONFIDENCE, "tasks": report}
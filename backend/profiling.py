@@ -0,0 +1,211 @@
+"""
+按需性能剖析模块
+管理员通过请求头 X-Profile: 1 或查询参数 ?profile=1 对单个请求启用 cProfile，
+剖析结果保存到 PROFILE_DIR，热点函数汇总由该目录中的所有结果合并而成（多 worker 共享）。
+cProfile 只记录启用它的线程，因此剖析在实际执行计算的线程内开启；
+同一进程同时只剖析一个请求，PROFILE_DIR 中只保留最近的 PROFILE_MAX_FILES 份结果
+"""
+
+import os
+import re
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Callable, Set, Tuple
+
+from tracing import get_logger
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "./data/profiles")
+PROFILE_TOP_N = int(os.environ.get("PROFILE_TOP_N", "30"))
+# PROFILE_DIR 中最多保留的剖析结果数，超出时删除最旧的
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "200"))
+
+_PROFILE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+_SORT_KEYS = {"cumulative", "tottime", "calls"}
+
+# 同一进程同时只剖析一个请求：cProfile 的开销会拖慢其他请求，并发剖析的结果也互相干扰
+_active_lock = threading.Lock()
+
+log = get_logger("profiling")
+
+
+def _parse_admin_user_ids(value: str) -> Set[int]:
+    user_ids = set()
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if not item.isdigit():
+            log.warning("忽略无效的管理员用户 ID", extra={"fields": {"value": item}})
+            continue
+        user_ids.add(int(item))
+    return user_ids
+
+
+# 管理员的用户 ID（逗号分隔），为空时剖析和管理接口完全关闭。
+# 按 ID 而不是邮箱判断：注册不验证邮箱，任何人都能抢注尚未注册的管理员邮箱，而已分配的 ID 无法被他人获得
+PROFILE_ADMIN_USER_IDS = _parse_admin_user_ids(os.environ.get("PROFILE_ADMIN_USER_IDS", ""))
+
+
+def is_admin(user: Dict[str, Any]) -> bool:
+    return user.get("id") in PROFILE_ADMIN_USER_IDS
+
+
+def profiling_requested(request, user: Dict[str, Any]) -> bool:
+    """请求是否要求剖析；未配置管理员时直接返回，不解析任何请求参数"""
+    if not PROFILE_ADMIN_USER_IDS:
+        return False
+    flag = request.headers.get("X-Profile") or request.query_params.get("profile")
+    return flag in ("1", "true") and is_admin(user)
+
+
+class ProfileSession:
+    """
+    一次剖析：用 wrap 包装的函数在执行它的线程内启用 cProfile，执行结束后保存结果。
+    保存成功后 profile_id 才有值；被包装的函数从未执行（如请求在计算开始前被取消）时不产生结果
+    """
+
+    def __init__(self, label: str):
+        self.profile_id: Optional[str] = None
+        self._label = label
+        self._state_lock = threading.Lock()
+        self._started = False
+        self._closed = False
+
+    def wrap(self, fn: Callable[[], Any]) -> Callable[[], Any]:
+        def profiled():
+            with self._state_lock:
+                if self._started or self._closed:
+                    return fn()
+                self._started = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return fn()
+            finally:
+                profiler.disable()
+                try:
+                    profile_id = f"{self._label}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+                    _store_profile(profile_id, profiler)
+                    self.profile_id = profile_id
+                except Exception:
+                    log.exception("剖析结果保存失败")
+                finally:
+                    _active_lock.release()
+        return profiled
+
+    def close(self):
+        """请求结束；被包装的函数尚未开始时放弃剖析，已开始的由执行线程在结束后释放名额"""
+        with self._state_lock:
+            self._closed = True
+            started = self._started
+        if not started:
+            _active_lock.release()
+
+
+@contextmanager
+def profile_request(request, user: Dict[str, Any], label: str):
+    """
+    为请求创建剖析会话，with 块内用 session.wrap(fn) 包装要剖析的计算
+
+    Yields:
+        ProfileSession；未要求剖析，或本进程已有请求在剖析时为 None
+    """
+    if not profiling_requested(request, user):
+        yield None
+        return
+    if not _active_lock.acquire(blocking=False):
+        log.info("已有请求在剖析，本次不剖析", extra={"fields": {"label": label}})
+        yield None
+        return
+
+    session = ProfileSession(label)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _saved_profiles() -> List[Tuple[float, str]]:
+    """PROFILE_DIR 中的剖析结果，按 (修改时间, 路径) 从旧到新排列"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.name.endswith(".prof"):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    entries.sort()
+    return entries
+
+
+def _prune_profiles():
+    """只保留最近的 PROFILE_MAX_FILES 份剖析结果"""
+    entries = _saved_profiles()
+    for _, path in entries[:max(0, len(entries) - PROFILE_MAX_FILES)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # 其他 worker 已经删除
+            pass
+
+
+def _store_profile(profile_id: str, profiler: cProfile.Profile):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    # 先写临时文件再改名，其他 worker 汇总时不会读到写了一半的结果
+    profiler.dump_stats(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    _prune_profiles()
+
+
+def load_profile(profile_id: str) -> Optional[pstats.Stats]:
+    """读取已保存的剖析结果，ID 不合法或文件不存在时返回 None"""
+    if not _PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    if not os.path.exists(path):
+        return None
+    return pstats.Stats(path)
+
+
+def top_functions(stats: pstats.Stats, limit: int = PROFILE_TOP_N, sort: str = "cumulative") -> List[Dict[str, Any]]:
+    """按累计耗时 / 自身耗时 / 调用次数取前 limit 个函数"""
+    if sort not in _SORT_KEYS:
+        sort = "cumulative"
+    rows = []
+    for (filename, line, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": func,
+            "location": f"{filename}:{line}",
+            "calls": calls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        })
+    key = {"cumulative": "cumtime_ms", "tottime": "tottime_ms", "calls": "calls"}[sort]
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return rows[:limit]
+
+
+def aggregate_report(limit: int = PROFILE_TOP_N, sort: str = "cumulative") -> Dict[str, Any]:
+    """PROFILE_DIR 中所有剖析结果（即所有 worker 被剖析的请求）的热点函数汇总"""
+    aggregate = None
+    requests = 0
+    for _, path in _saved_profiles():
+        try:
+            if aggregate is None:
+                aggregate = pstats.Stats(path)
+            else:
+                aggregate.add(path)
+        except (OSError, EOFError, ValueError, TypeError):
+            # 汇总期间被其他 worker 清理掉，或文件已损坏
+            continue
+        requests += 1
+    if aggregate is None:
+        return {"requests": 0, "functions": []}
+    return {"requests": requests, "functions": top_functions(aggregate, limit, sort)}
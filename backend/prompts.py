@@ -0,0 +1,362 @@
+"""
+Prompt 与输出 Schema 注册表
+每个任务（parse / advice）有若干版本的 prompt，启动时预先渲染 system 消息并估算其 token 数；
+请求可通过 X-Prompt-Version 指定版本，否则按权重随机选择（A/B 测试），各版本的耗时、token 和解析成功率
+累计在共享状态中，用于挑选最快且输出合格的版本
+"""
+
+import os
+import re
+import json
+import math
+import random
+from typing import Dict, Any, List, Optional
+
+from shared_state import get_shared_state
+from tracing import get_logger
+
+log = get_logger("prompts")
+
+
+# ========== v1：原始完整 prompt ==========
+
+# System Prompt 用于指导 AI 解析简历
+RESUME_PARSER_SYSTEM_PROMPT = """你是一个专业的简历解析助手，专门为中国校招网申场景设计。
+
+请仔细分析提供的简历文本，提取关键信息并输出为严格的 JSON 格式。
+
+**输出 JSON 结构要求：**
+
+```json
+{
+  "personal_info": {
+    "name": "姓名",
+    "phone": "电话",
+    "email": "邮箱"
+  },
+  "education": [
+    {
+      "school": "学校全称",
+      "major": "专业",
+      "degree": "学位",
+      "start_date": "YYYY-MM",
+      "end_date": "YYYY-MM"
+    }
+  ],
+  "work_experience": [
+    {
+      "company": "公司全称",
+      "position": "职位名称",
+      "start_date": "YYYY-MM",
+      "end_date": "YYYY-MM",
+      "description": "完整的工作描述，包括：工作职责、项目内容、使用的技术、取得的成果等所有详细信息，不要删减",
+      "achievements": ["具体成果1", "具体成果2"],
+      "tech_stack": ["技术1", "技术2"]
+    }
+  ],
+  "projects": [
+    {
+      "name": "项目名称",
+      "role": "担任角色",
+      "start_date": "YYYY-MM",
+      "end_date": "YYYY-MM",
+      "description": "完整的项目描述，包括：项目背景、个人职责、技术方案、项目成果等所有详细信息，不要删减",
+      "achievements": ["具体成果1", "具体成果2"],
+      "tech_stack": ["技术1", "技术2"]
+    }
+  ],
+  "campus_experience": [
+    {
+      "organization": "组织名称",
+      "role": "担任职位",
+      "start_date": "YYYY-MM",
+      "end_date": "YYYY-MM",
+      "description": "经历描述"
+    }
+  ],
+  "skills_certifications": {
+    "skills": ["技能1", "技能2"]
+  }
+}
+```
+
+**规则：**
+1. 日期格式统一为 "YYYY-MM"
+2. 按时间倒序排列
+3. 没有的信息使用空字符串或空数组
+4. 保持原文中的专有名词
+5. 只输出 JSON，不要有其他文字
+6. campus_experience 包括学生会、社团、志愿者、班级干部等校园活动经历
+7. **重要：description 字段必须保留原始简历中的完整描述内容，不要删减或摘要，保留所有细节、成果数据、技术栈等信息**
+8. **绝对禁止：如果简历中没有校园经历，campus_experience 必须返回空数组 []，严禁虚构或编造任何校园经历**
+"""
+
+# Prompt 用于生成简历修改建议
+RESUME_ADVICE_PROMPT = """你是一位资深的简历优化专家，专门帮助中国学生优化校招简历。
+
+请基于以下简历内容，提供专业的修改建议和优化意见。
+
+【分析维度】
+1. **格式与排版**
+   - 是否简洁清晰
+   - 重点是否突出
+   - 是否有冗余信息
+
+2. **内容质量**
+   - 是否有量化成果（数字、百分比）
+   - 是否使用STAR法则描述经历
+   - 是否突出个人贡献和价值
+
+3. **关键词优化**
+   - 是否包含目标岗位相关关键词
+   - 技能描述是否具体
+
+4. **针对性建议**
+   - 针对校招场景的特别建议
+   - 常见错误和改进方法
+
+【输出格式】
+请按以下JSON格式输出：
+
+```json
+{
+  "score": 85,
+  "summary": "简历整体评价（2-3句话）",
+  "strengths": ["优点1", "优点2", "优点3"],
+  "improvements": [
+    {
+      "section": "工作经历",
+      "issue": "描述过于笼统，缺乏具体成果",
+      "suggestion": "建议使用STAR法则，添加量化的成果数据，如'提升了XX%'"
+    },
+    {
+      "section": "技能",
+      "issue": "技能描述不够具体",
+      "suggestion": "建议标注熟练程度，并补充与目标岗位相关的技能"
+    }
+  ],
+  "action_items": ["立即修改项1", "建议优化项2", "长期提升项3"]
+}
+```
+
+**重要：**
+- 评分范围 0-100
+- 建议要具体、可操作
+- 语气要鼓励且专业
+- 只输出 JSON，不要有其他说明文字
+"""
+
+# ========== 输出 Schema ==========
+
+# 解析结果的 JSON 结构，字段值为示例/格式说明
+PARSE_SCHEMA: Dict[str, Any] = {
+    "personal_info": {"name": "", "phone": "", "email": ""},
+    "education": [
+        {"school": "", "major": "", "degree": "", "start_date": "YYYY-MM", "end_date": "YYYY-MM"}
+    ],
+    "work_experience": [
+        {"company": "", "position": "", "start_date": "YYYY-MM", "end_date": "YYYY-MM",
+         "description": "", "achievements": [""], "tech_stack": [""]}
+    ],
+    "projects": [
+        {"name": "", "role": "", "start_date": "YYYY-MM", "end_date": "YYYY-MM",
+         "description": "", "achievements": [""], "tech_stack": [""]}
+    ],
+    "campus_experience": [
+        {"organization": "", "role": "", "start_date": "YYYY-MM", "end_date": "YYYY-MM", "description": ""}
+    ],
+    "skills_certifications": {"skills": [""]},
+}
+
+ADVICE_SCHEMA: Dict[str, Any] = {
+    "score": 0,
+    "summary": "",
+    "strengths": [""],
+    "improvements": [{"section": "", "issue": "", "suggestion": ""}],
+    "action_items": [""],
+}
+
+
+def encode_schema(schema: Dict[str, Any]) -> str:
+    """紧凑编码：无缩进、无多余空白的 JSON"""
+    return json.dumps(schema, ensure_ascii=False, separators=(",", ":"))
+
+
+RESUME_PARSER_COMPACT_PROMPT = f"""你是校招简历解析助手。把简历文本解析为如下结构的 JSON，只输出 JSON：
+{encode_schema(PARSE_SCHEMA)}
+规则：日期统一 YYYY-MM；按时间倒序；缺失信息用空字符串或空数组；保留专有名词；
+description 保留原文完整描述，不删减不摘要；campus_experience 指学生会、社团、志愿者、班干部等校园经历，
+原文没有时必须返回 []，严禁编造。"""
+
+RESUME_ADVICE_COMPACT_PROMPT = f"""你是校招简历优化专家。从格式排版、内容质量（量化成果、STAR 法则、个人贡献）、
+岗位关键词、校招针对性四方面给出修改建议，只输出如下结构的 JSON：
+{encode_schema(ADVICE_SCHEMA)}
+score 为 0-100 的整数；建议具体可操作，语气鼓励且专业。"""
+
+
+# ========== 版本注册 ==========
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文字符按 1 个 token，其余按 4 个字符 1 个 token"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class PromptVersion:
+    """一个版本的 prompt：system 消息和请求体的固定部分在注册时生成，调用时只拼接简历文本"""
+
+    def __init__(self, task: str, version: str, system: str, user_prefix: str, user_suffix: str = "",
+                 temperature: float = 0.1, max_tokens: int = 4096, weight: float = 0.0):
+        self.task = task
+        self.version = version
+        self.user_prefix = user_prefix
+        self.user_suffix = user_suffix
+        self.weight = weight
+        self.system_tokens = estimate_tokens(system)
+        self._system_message = {"role": "system", "content": system}
+        self._options = {"temperature": temperature, "max_tokens": max_tokens}
+
+    def payload(self, model: str, resume_text: str) -> Dict[str, Any]:
+        """生成 chat/completions 请求体"""
+        return {
+            "model": model,
+            "messages": [
+                self._system_message,
+                {"role": "user", "content": self.user_prefix + resume_text + self.user_suffix},
+            ],
+            **self._options,
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return {"version": self.version, "weight": self.weight, "system_tokens": self.system_tokens}
+
+
+PROMPTS: Dict[str, Dict[str, PromptVersion]] = {}
+
+
+def register(prompt: PromptVersion):
+    PROMPTS.setdefault(prompt.task, {})[prompt.version] = prompt
+
+
+register(PromptVersion(
+    "parse", "v1", RESUME_PARSER_SYSTEM_PROMPT,
+    user_prefix="以下是简历文本内容，请解析：\n\n",
+    temperature=0.1, weight=1.0,
+))
+register(PromptVersion(
+    "parse", "v2-compact", RESUME_PARSER_COMPACT_PROMPT,
+    user_prefix="简历文本：\n",
+    temperature=0.1,
+))
+register(PromptVersion(
+    "advice", "v1", RESUME_ADVICE_PROMPT,
+    user_prefix="请分析以下简历并提供修改建议：\n\n---简历开始---\n", user_suffix="\n---简历结束---",
+    temperature=0.3, weight=1.0,
+))
+register(PromptVersion(
+    "advice", "v2-compact", RESUME_ADVICE_COMPACT_PROMPT,
+    user_prefix="---简历开始---\n", user_suffix="\n---简历结束---",
+    temperature=0.3,
+))
+
+
+def _apply_prompt_weights(raw: str):
+    """
+    按 PROMPT_WEIGHTS 覆盖各版本的流量权重；
+    JSON 不合法、未知的任务或版本、非法的权重只记录警告并跳过，不影响服务启动
+    """
+    try:
+        overrides = json.loads(raw)
+    except ValueError:
+        log.warning("PROMPT_WEIGHTS 不是合法的 JSON，使用默认权重")
+        return
+    if not isinstance(overrides, dict):
+        log.warning("PROMPT_WEIGHTS 必须是 JSON 对象，使用默认权重")
+        return
+
+    for task, weights in overrides.items():
+        if task not in PROMPTS or not isinstance(weights, dict):
+            log.warning("忽略未知任务的 prompt 权重", extra={"fields": {"task": task}})
+            continue
+        for version, weight in weights.items():
+            try:
+                value = float(weight)
+            except (TypeError, ValueError):
+                value = -1.0
+            if version not in PROMPTS[task] or not math.isfinite(value) or value < 0:
+                log.warning("忽略无效的 prompt 权重", extra={"fields": {
+                    "task": task, "version": version, "weight": weight
+                }})
+                continue
+            PROMPTS[task][version].weight = value
+
+
+# PROMPT_WEIGHTS 为 JSON，按任务覆盖各版本的流量权重，如 {"parse": {"v1": 1, "v2-compact": 1}}
+_apply_prompt_weights(os.environ.get("PROMPT_WEIGHTS", "{}"))
+
+
+def select_prompt(task: str, version: Optional[str] = None) -> PromptVersion:
+    """
+    选择本次请求使用的 prompt 版本：指定了 version 时使用它，否则按权重随机选择
+
+    Raises:
+        KeyError: 指定的版本不存在
+    """
+    versions = PROMPTS[task]
+    if version:
+        if version not in versions:
+            raise KeyError(version)
+        return versions[version]
+    candidates = [prompt for prompt in versions.values() if prompt.weight > 0]
+    if not candidates:
+        return next(iter(versions.values()))
+    return random.choices(candidates, weights=[prompt.weight for prompt in candidates])[0]
+
+
+# ========== 版本统计 ==========
+
+_STAT_FIELDS = ("calls", "success", "latency_ms", "prompt_tokens", "completion_tokens")
+
+
+def _stat_key(prompt: PromptVersion, field: str) -> str:
+    return f"metrics:prompt:{prompt.task}:{prompt.version}:{field}"
+
+
+def call_counters(prompt: PromptVersion, elapsed_ms: float, usage: Optional[Dict[str, Any]],
+                  success: bool) -> Dict[str, int]:
+    """一次模型调用对应的各统计项增量；success 表示输出是合法 JSON 且通过结构校验"""
+    usage = usage or {}
+    return {
+        _stat_key(prompt, "calls"): 1,
+        _stat_key(prompt, "success"): 1 if success else 0,
+        _stat_key(prompt, "latency_ms"): int(elapsed_ms),
+        _stat_key(prompt, "prompt_tokens"): int(usage.get("prompt_tokens") or 0),
+        _stat_key(prompt, "completion_tokens"): int(usage.get("completion_tokens") or 0),
+    }
+
+
+def prompt_stats() -> Dict[str, List[Dict[str, Any]]]:
+    """各任务、各 prompt 版本的累计统计（所有 worker 汇总）"""
+    state = get_shared_state()
+    report = {}
+    for task, versions in PROMPTS.items():
+        rows = []
+        for prompt in versions.values():
+            counts = {}
+            for field in _STAT_FIELDS:
+                value = state.get(_stat_key(prompt, field))
+                counts[field] = int(value) if value is not None else 0
+            calls = counts["calls"]
+            rows.append({
+                **prompt.describe(),
+                "calls": calls,
+                "success_rate": round(counts["success"] / calls, 3) if calls else None,
+                "avg_latency_ms": round(counts["latency_ms"] / calls, 1) if calls else None,
+                "avg_prompt_tokens": round(counts["prompt_tokens"] / calls, 1) if calls else None,
+                "avg_completion_tokens": round(counts["completion_tokens"] / calls, 1) if calls else None,
+            })
+        report[task] = rows
+    return report
@@ -0,0 +1,227 @@
+"""
+用户配额模块
+每个用户在每个接口上有两个令牌桶：请求数和 LLM token 数。桶存放在共享状态中，多 worker 间一致；
+实际 token 用量取自上游响应的 usage 字段，同时按天聚合写入 cvfiller.db 的 llm_usage 表
+"""
+
+import os
+import json
+import math
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any
+
+import orjson
+
+import async_db
+from database import upsert_llm_usage
+from llm_client import usage_recorder
+from shared_state import get_shared_state, shared_lock
+from tracing import get_logger
+
+QUOTA_ENABLED = os.environ.get("QUOTA_ENABLED", "1") != "0"
+
+# 每个接口的令牌桶配置：capacity 为桶容量，period 为从空到满的秒数；capacity 为 0 表示不限制
+DEFAULT_QUOTA_LIMITS: Dict[str, Dict[str, Dict[str, int]]] = {
+    "parse-resume": {
+        "requests": {"capacity": 30, "period": 3600},
+        "tokens": {"capacity": 200000, "period": 86400},
+    },
+    "resume-advice": {
+        "requests": {"capacity": 20, "period": 3600},
+        "tokens": {"capacity": 150000, "period": 86400},
+    },
+}
+_QUOTA_KINDS = ("requests", "tokens")
+
+log = get_logger("quota")
+
+
+def _valid_limit(limit: Dict[str, Any]) -> bool:
+    """capacity 和 period 都是非负整数；capacity 不为 0 时 period 必须为正"""
+    for field in ("capacity", "period"):
+        value = limit.get(field)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            return False
+    return limit["capacity"] == 0 or limit["period"] > 0
+
+
+def _load_quota_limits(raw: str) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """
+    在默认配置上按接口、按桶类型逐项合并 QUOTA_LIMITS；
+    JSON 不合法或某项配置无效时记录警告并跳过，保留该项的默认值
+    """
+    limits = {endpoint: {kind: dict(limit) for kind, limit in kinds.items()}
+              for endpoint, kinds in DEFAULT_QUOTA_LIMITS.items()}
+    try:
+        overrides = json.loads(raw)
+    except ValueError:
+        log.warning("QUOTA_LIMITS 不是合法的 JSON，使用默认配额")
+        return limits
+    if not isinstance(overrides, dict):
+        log.warning("QUOTA_LIMITS 必须是 JSON 对象，使用默认配额")
+        return limits
+
+    for endpoint, kinds in overrides.items():
+        if not isinstance(kinds, dict):
+            log.warning("忽略无效的配额配置", extra={"fields": {"endpoint": endpoint}})
+            continue
+        for kind, override in kinds.items():
+            if kind not in _QUOTA_KINDS or not isinstance(override, dict):
+                log.warning("忽略无效的配额配置", extra={"fields": {"endpoint": endpoint, "kind": kind}})
+                continue
+            merged = {**limits.get(endpoint, {}).get(kind, {}), **override}
+            if not _valid_limit(merged):
+                log.warning("忽略无效的配额配置", extra={"fields": {
+                    "endpoint": endpoint, "kind": kind, "limit": override
+                }})
+                continue
+            limits.setdefault(endpoint, {})[kind] = merged
+    return limits
+
+
+# QUOTA_LIMITS 为 JSON，按接口覆盖默认配置，如 {"parse-resume": {"requests": {"capacity": 10, "period": 3600}}}，
+# 只写 capacity 或 period 时另一项沿用默认值
+QUOTA_LIMITS = _load_quota_limits(os.environ.get("QUOTA_LIMITS", "{}"))
+
+
+class QuotaExceeded(Exception):
+    """配额不足，headers 中带有限额信息和 Retry-After"""
+
+    def __init__(self, message: str, headers: Dict[str, str]):
+        super().__init__(message)
+        self.headers = headers
+
+
+class _Bucket:
+    """令牌桶快照：level 为当前剩余量，按 capacity / period 的速率匀速回填"""
+
+    def __init__(self, capacity: int, period: int, level: float, updated_at: float):
+        self.capacity = capacity
+        self.period = period
+        self.level = level
+        self.updated_at = updated_at
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def seconds_until(self, level: float) -> int:
+        """回填到 level 还需的秒数"""
+        return max(0, math.ceil((level - self.level) / self.rate))
+
+
+def _bucket_key(user_id: int, endpoint: str, kind: str) -> str:
+    return f"bucket:{endpoint}:{kind}:{user_id}"
+
+
+def _load_bucket(key: str, limit: Dict[str, int], now: float) -> _Bucket:
+    value = get_shared_state().get(key)
+    if value is None:
+        return _Bucket(limit["capacity"], limit["period"], limit["capacity"], now)
+    data = orjson.loads(value)
+    bucket = _Bucket(limit["capacity"], limit["period"], data["level"], data["updated_at"])
+    bucket.refill(now)
+    return bucket
+
+
+def _save_bucket(key: str, bucket: _Bucket):
+    get_shared_state().set(key, orjson.dumps({"level": bucket.level, "updated_at": bucket.updated_at}),
+                           ex=bucket.period)
+
+
+class QuotaTicket:
+    """一次请求的配额凭据，记录扣减后的桶状态用于生成响应头"""
+
+    def __init__(self, user_id: int, endpoint: str):
+        self.user_id = user_id
+        self.endpoint = endpoint
+        self.limits = QUOTA_LIMITS.get(endpoint, {})
+        self.requests: Optional[_Bucket] = None
+        self.tokens: Optional[_Bucket] = None
+
+    def _limit(self, kind: str) -> Optional[Dict[str, int]]:
+        limit = self.limits.get(kind)
+        return limit if QUOTA_ENABLED and limit and limit.get("capacity") else None
+
+    def headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.requests is not None:
+            headers["X-RateLimit-Limit"] = str(self.requests.capacity)
+            headers["X-RateLimit-Remaining"] = str(max(0, int(self.requests.level)))
+            headers["X-RateLimit-Reset"] = str(self.requests.seconds_until(self.requests.capacity))
+        if self.tokens is not None:
+            headers["X-TokenLimit-Limit"] = str(self.tokens.capacity)
+            headers["X-TokenLimit-Remaining"] = str(max(0, int(self.tokens.level)))
+            headers["X-TokenLimit-Reset"] = str(self.tokens.seconds_until(self.tokens.capacity))
+        return headers
+
+    async def acquire(self):
+        """
+        扣减一次请求，并要求 token 桶仍有余量（实际 token 用量在调用结束后扣减）
+
+        Raises:
+            QuotaExceeded: 任一令牌桶不足
+        """
+        request_limit = self._limit("requests")
+        token_limit = self._limit("tokens")
+        if request_limit is None and token_limit is None:
+            return
+
+        async with shared_lock(f"quota:{self.endpoint}:{self.user_id}"):
+            now = time.time()
+            if token_limit is not None:
+                self.tokens = await asyncio.to_thread(
+                    _load_bucket, _bucket_key(self.user_id, self.endpoint, "tokens"), token_limit, now)
+            if request_limit is not None:
+                self.requests = await asyncio.to_thread(
+                    _load_bucket, _bucket_key(self.user_id, self.endpoint, "requests"), request_limit, now)
+
+            if self.tokens is not None and self.tokens.level < 1:
+                raise QuotaExceeded("token 配额已用完，请稍后再试", {
+                    **self.headers(), "Retry-After": str(self.tokens.seconds_until(1))
+                })
+            if self.requests is not None:
+                if self.requests.level < 1:
+                    raise QuotaExceeded("请求过于频繁，请稍后再试", {
+                        **self.headers(), "Retry-After": str(self.requests.seconds_until(1))
+                    })
+                self.requests.level -= 1
+                await asyncio.to_thread(
+                    _save_bucket, _bucket_key(self.user_id, self.endpoint, "requests"), self.requests)
+
+    async def _consume_tokens(self, amount: int):
+        token_limit = self._limit("tokens")
+        if token_limit is None or amount <= 0:
+            return
+        key = _bucket_key(self.user_id, self.endpoint, "tokens")
+        async with shared_lock(f"quota:{self.endpoint}:{self.user_id}"):
+            self.tokens = await asyncio.to_thread(_load_bucket, key, token_limit, time.time())
+            # 允许透支，透支部分在回填前会拒绝后续请求
+            self.tokens.level -= amount
+            await asyncio.to_thread(_save_bucket, key, self.tokens)
+
+    @asynccontextmanager
+    async def metering(self):
+        """统计 with 块内的 LLM token 用量，结束时（包括失败时）扣减 token 桶并写入用量表"""
+        with usage_recorder() as usage:
+            try:
+                yield usage
+            finally:
+                await self._consume_tokens(usage["total_tokens"])
+                try:
+                    await async_db.write(upsert_llm_usage, self.user_id, self.endpoint,
+                                         usage["prompt_tokens"], usage["completion_tokens"])
+                except Exception:
+                    log.exception("用量写入失败")
+
+
+async def acquire_quota(user_id: int, endpoint: str) -> QuotaTicket:
+    ticket = QuotaTicket(user_id, endpoint)
+    await ticket.acquire()
+    return ticket
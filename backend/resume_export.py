@@ -0,0 +1,106 @@
+"""
+简历批量导出 / 导入
+导出按数据库游标逐条生成 NDJSON 或 ZIP 字节块，内存占用与简历数量无关；
+导入接受同样的两种格式
+"""
+
+import io
+import time
+import zipfile
+from typing import Dict, Any, Iterator, BinaryIO
+
+import orjson
+
+from database import iter_user_resumes
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "zip": "application/zip",
+}
+
+# 导入时读取的字段，值必须是字符串（数字会转成字符串，如纯数字的电话号码）；None 表示缺省
+IMPORT_FIELDS = (
+    "name", "email", "phone", "education", "experience", "campus_experience", "campusExperience",
+    "skills", "source_filename", "created_at", "updated_at",
+)
+
+
+def _export_record(resume: Dict[str, Any]) -> Dict[str, Any]:
+    resume.pop("user_id", None)
+    return resume
+
+
+def ndjson_stream(user_id: int) -> Iterator[bytes]:
+    """每份简历一行 JSON"""
+    for resume in iter_user_resumes(user_id):
+        yield orjson.dumps(_export_record(resume)) + b"\n"
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """只写、不可 seek 的缓冲区，zipfile 写入后由生成器取走已写出的字节"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def zip_stream(user_id: int) -> Iterator[bytes]:
+    """每份简历一个 resumes/<id>.json；不可 seek 的输出使 zipfile 使用数据描述符，可边写边发"""
+    buffer = _ChunkBuffer()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for resume in iter_user_resumes(user_id):
+            info = zipfile.ZipInfo(f"resumes/{resume['id']}.json", date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, orjson.dumps(_export_record(resume), option=orjson.OPT_INDENT_2))
+            yield buffer.drain()
+    # 中央目录在关闭时写出
+    yield buffer.drain()
+
+
+def read_import_records(fileobj: BinaryIO, filename: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐条读取导入文件中的简历：.zip 读取其中所有 .json 文件，其他按 NDJSON 逐行解析
+
+    Raises:
+        ValueError: 内容不是合法的 JSON 对象
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for name in archive.namelist():
+                if name.endswith(".json"):
+                    yield _parse_record(archive.read(name), name)
+        return
+
+    for line_number, line in enumerate(fileobj, start=1):
+        if line.strip():
+            yield _parse_record(line, f"第 {line_number} 行")
+
+
+def _parse_record(data: bytes, location: str) -> Dict[str, Any]:
+    try:
+        record = orjson.loads(data)
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"{location} 不是合法的 JSON: {e}")
+    if not isinstance(record, dict):
+        raise ValueError(f"{location} 不是 JSON 对象")
+    for field in IMPORT_FIELDS:
+        value = record.get(field)
+        if value is None or isinstance(value, str):
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            record[field] = str(value)
+        else:
+            raise ValueError(f"{location}: {field} 字段必须是字符串")
+    return record
@@ -5,144 +5,24 @@
 
 import os
 import json
+import hashlib
 import tempfile
 from typing import Optional, Dict, Any
 from pathlib import Path
-import fitz  # PyMuPDF
-import docx2txt
-import requests
 
+from lazy_imports import lazy_import, preload, IMPORT_TIMINGS
+from tracing import setup_logging, get_logger, request_context, span, log_payload
+import llm_client
+from model_router import run_cascade, score_parsed_resume, score_resume_advice, cascade_metrics
+from prompts import PromptVersion, select_prompt, prompt_stats
 
-# 腾讯 Hunyuan 大模型 API 配置
-AI_API_KEY = os.environ.get("AI_API_KEY", "DecU74WXOm8RZ9AnD8F5Ea60AaDd4c4e9729031e302324Ba")
-AI_API_URL = os.environ.get("AI_API_URL", "https://tcamp.qq.com/openai/chat/completions")
+# 重量级依赖延迟到首次使用（或启动预热）时导入
+fitz = lazy_import("fitz")  # PyMuPDF
+docx2txt = lazy_import("docx2txt")
+requests = lazy_import("requests")
+jwt = lazy_import("jwt")
 
-
-# System Prompt 用于指导 AI 解析简历
-RESUME_PARSER_SYSTEM_PROMPT = """你是一个专业的简历解析助手，专门为中国校招网申场景设计。
-
-请仔细分析提供的简历文本，提取关键信息并输出为严格的 JSON 格式。
-
-**输出 JSON 结构要求：**
-
-```json
-{
-  "personal_info": {
-    "name": "姓名",
-    "phone": "电话",
-    "email": "邮箱"
-  },
-  "education": [
-    {
-      "school": "学校全称",
-      "major": "专业",
-      "degree": "学位",
-      "start_date": "YYYY-MM",
-      "end_date": "YYYY-MM"
-    }
-  ],
-  "work_experience": [
-    {
-      "company": "公司全称",
-      "position": "职位名称",
-      "start_date": "YYYY-MM",
-      "end_date": "YYYY-MM",
-      "description": "完整的工作描述，包括：工作职责、项目内容、使用的技术、取得的成果等所有详细信息，不要删减",
-      "achievements": ["具体成果1", "具体成果2"],
-      "tech_stack": ["技术1", "技术2"]
-    }
-  ],
-  "projects": [
-    {
-      "name": "项目名称",
-      "role": "担任角色",
-      "start_date": "YYYY-MM",
-      "end_date": "YYYY-MM",
-      "description": "完整的项目描述，包括：项目背景、个人职责、技术方案、项目成果等所有详细信息，不要删减",
-      "achievements": ["具体成果1", "具体成果2"],
-      "tech_stack": ["技术1", "技术2"]
-    }
-  ],
-  "campus_experience": [
-    {
-      "organization": "组织名称",
-      "role": "担任职位",
-      "start_date": "YYYY-MM",
-      "end_date": "YYYY-MM",
-      "description": "经历描述"
-    }
-  ],
-  "skills_certifications": {
-    "skills": ["技能1", "技能2"]
-  }
-}
-```
-
-**规则：**
-1. 日期格式统一为 "YYYY-MM"
-2. 按时间倒序排列
-3. 没有的信息使用空字符串或空数组
-4. 保持原文中的专有名词
-5. 只输出 JSON，不要有其他文字
-6. campus_experience 包括学生会、社团、志愿者、班级干部等校园活动经历
-7. **重要：description 字段必须保留原始简历中的完整描述内容，不要删减或摘要，保留所有细节、成果数据、技术栈等信息**
-8. **绝对禁止：如果简历中没有校园经历，campus_experience 必须返回空数组 []，严禁虚构或编造任何校园经历**
-"""
-
-# Prompt 用于生成简历修改建议
-RESUME_ADVICE_PROMPT = """你是一位资深的简历优化专家，专门帮助中国学生优化校招简历。
-
-请基于以下简历内容，提供专业的修改建议和优化意见。
-
-【分析维度】
-1. **格式与排版**
-   - 是否简洁清晰
-   - 重点是否突出
-   - 是否有冗余信息
-
-2. **内容质量**
-   - 是否有量化成果（数字、百分比）
-   - 是否使用STAR法则描述经历
-   - 是否突出个人贡献和价值
-
-3. **关键词优化**
-   - 是否包含目标岗位相关关键词
-   - 技能描述是否具体
-
-4. **针对性建议**
-   - 针对校招场景的特别建议
-   - 常见错误和改进方法
-
-【输出格式】
-请按以下JSON格式输出：
-
-```json
-{
-  "score": 85,
-  "summary": "简历整体评价（2-3句话）",
-  "strengths": ["优点1", "优点2", "优点3"],
-  "improvements": [
-    {
-      "section": "工作经历",
-      "issue": "描述过于笼统，缺乏具体成果",
-      "suggestion": "建议使用STAR法则，添加量化的成果数据，如'提升了XX%'"
-    },
-    {
-      "section": "技能",
-      "issue": "技能描述不够具体",
-      "suggestion": "建议标注熟练程度，并补充与目标岗位相关的技能"
-    }
-  ],
-  "action_items": ["立即修改项1", "建议优化项2", "长期提升项3"]
-}
-```
-
-**重要：**
-- 评分范围 0-100
-- 建议要具体、可操作
-- 语气要鼓励且专业
-- 只输出 JSON，不要有其他说明文字
-"""
+log = get_logger("parser")
 
 
 def extract_text_from_pdf(file_path: str) -> str:
@@ -154,7 +34,7 @@ def extract_text_from_pdf(file_path: str) -> str:
                 page = pdf[page_num]
                 text += page.get_text()
     except Exception as e:
-        print(f"PDF 解析错误: {e}")
+        log.warning("PDF 解析错误", extra={"fields": {"error": str(e)}})
         raise
     return text
 
@@ -165,7 +45,7 @@ def extract_text_from_docx(file_path: str) -> str:
         text = docx2txt.process(file_path)
         return text
     except Exception as e:
-        print(f"DOCX 解析错误: {e}")
+        log.warning("DOCX 解析错误", extra={"fields": {"error": str(e)}})
         raise
 
 
@@ -181,110 +61,93 @@ def extract_text_from_file(file_path: str) -> str:
         raise ValueError(f"不支持的文件格式: {file_extension}")
 
 
-def parse_resume_with_hunyuan(resume_text: str) -> Dict[str, Any]:
-    """使用腾讯 Hunyuan 大模型 API 解析简历文本"""
+def parse_model_json(result: Dict[str, Any]) -> Dict[str, Any]:
+    """从 chat/completions 响应中取出模型输出并解析为 JSON（兼容 ```json 代码块包裹）"""
+    # 提取生成的文本 (OpenAI 兼容格式)
+    if not result.get("choices"):
+        raise Exception(f"API 返回结果异常: {result}")
+    generated_text = result["choices"][0]["message"]["content"]
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {AI_API_KEY}"
-    }
-    
-    payload = {
-        "model": "hunyuan-lite",
-        "messages": [
-            {
-                "role": "system",
-                "content": RESUME_PARSER_SYSTEM_PROMPT
-            },
-            {
-                "role": "user",
-                "content": f"以下是简历文本内容，请解析：\n\n{resume_text}"
-            }
-        ],
-        "temperature": 0.1,
-        "max_tokens": 4096
-    }
+    try:
+        return json.loads(generated_text)
+    except json.JSONDecodeError as e:
+        log.info("模型输出不是合法 JSON，尝试清理后重新解析", extra={"fields": {"error": str(e)}})
+        log_payload("模型原始响应", generated_text)
+        # 尝试清理后重新解析
+        cleaned_text = generated_text.strip()
+        if cleaned_text.startswith("```json"):
+            cleaned_text = cleaned_text[7:]
+        if cleaned_text.endswith("```"):
+            cleaned_text = cleaned_text[:-3]
+        return json.loads(cleaned_text.strip())
+
+
+def parse_resume_with_hunyuan(resume_text: str, prompt: Optional[PromptVersion] = None) -> Dict[str, Any]:
+    """
+    使用腾讯 Hunyuan 大模型 API 解析简历文本，输出不完整时按 PARSE_MODEL_CASCADE 升级模型
+
+    Args:
+        prompt: 使用的 prompt 版本，默认按权重选择
+    """
+    prompt = prompt or select_prompt("parse")
     
     try:
-        response = requests.post(
-            AI_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=60
+        return run_cascade(
+            prompt, resume_text, parse_model_json,
+            lambda data: score_parsed_resume(data, resume_text),
         )
-        response.raise_for_status()
-        
-        result = response.json()
-        
-        # 提取生成的文本 (OpenAI 兼容格式)
-        if "choices" in result and len(result["choices"]) > 0:
-            generated_text = result["choices"][0]["message"]["content"]
-            
-            # 解析 JSON
-            try:
-                parsed_data = json.loads(generated_text)
-                return parsed_data
-            except json.JSONDecodeError as e:
-                print(f"JSON 解析错误: {e}")
-                print(f"原始响应: {generated_text}")
-                # 尝试清理后重新解析
-                cleaned_text = generated_text.strip()
-                if cleaned_text.startswith("```json"):
-                    cleaned_text = cleaned_text[7:]
-                if cleaned_text.endswith("```"):
-                    cleaned_text = cleaned_text[:-3]
-                return json.loads(cleaned_text.strip())
-        else:
-            raise Exception(f"API 返回结果异常: {result}")
-            
     except requests.exceptions.RequestException as e:
-        print(f"API 请求错误: {e}")
+        log.warning("API 请求错误", extra={"fields": {"error": str(e)}})
         raise
     except Exception as e:
-        print(f"解析错误: {e}")
+        log.warning("解析错误", extra={"fields": {"error": str(e)}})
         raise
 
 
-def parse_resume(file_path: str) -> Dict[str, Any]:
+def parse_resume(file_path: str, prompt: Optional[PromptVersion] = None) -> Dict[str, Any]:
     """
     主函数：解析简历文件
     
     Args:
         file_path: 简历文件路径 (PDF 或 DOCX)
+        prompt: 使用的 prompt 版本，默认按权重选择
     
     Returns:
         解析后的结构化 JSON 数据
     """
     # 1. 提取文本
-    print(f"正在提取文件: {file_path}")
-    resume_text = extract_text_from_file(file_path)
+    with span("extract"):
+        resume_text = extract_text_from_file(file_path)
     
     if not resume_text.strip():
         raise ValueError("无法从文件中提取文本")
     
-    print(f"提取文本长度: {len(resume_text)} 字符")
+    log.debug("文本提取完成", extra={"fields": {"text_length": len(resume_text)}})
     
     # 2. 调用 AI 解析
-    print("正在调用 Hunyuan AI 解析...")
-    parsed_data = parse_resume_with_hunyuan(resume_text)
+    prompt = prompt or select_prompt("parse")
+    parsed_data = parse_resume_with_hunyuan(resume_text, prompt)
     
     # 3. 添加元数据
     result = {
         "status": "success",
         "source_file": Path(file_path).name,
+        "prompt_version": prompt.version,
         "parsed_data": parsed_data
     }
     
     return result
 
 
-def parse_resume_from_bytes(file_bytes: bytes, filename: str) -> Dict[str, Any]:
+def parse_resume_from_bytes(file_bytes: bytes, filename: str,
+                            prompt: Optional[PromptVersion] = None) -> Dict[str, Any]:
     """
     从字节流解析简历（用于 Web 上传场景）
     
     Args:
         file_bytes: 文件字节内容
         filename: 文件名（用于判断格式）
+        prompt: 使用的 prompt 版本，默认按权重选择
     
     Returns:
         解析后的结构化 JSON 数据
@@ -297,7 +160,7 @@ def parse_resume_from_bytes(file_bytes: bytes, filename: str) -> Dict[str, Any]:
         tmp_path = tmp_file.name
     
     try:
-        result = parse_resume(tmp_path)
+        result = parse_resume(tmp_path, prompt)
         return result
     finally:
         # 清理临时文件
@@ -306,27 +169,42 @@ def parse_resume_from_bytes(file_bytes: bytes, filename: str) -> Dict[str, Any]:
 
 # ==================== FastAPI 服务 ====================
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Header
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr
 from typing import List
-import jwt
 from datetime import datetime, timedelta
 import os
+import asyncio
+import zipfile
 
 # 导入数据库模块
 from database import (
-    init_database, create_user, authenticate_user, get_user_by_id,
-    save_resume, get_user_resumes, get_resume_by_id, update_resume, delete_resume
+    init_database, get_db, hash_password, verify_password, insert_user, get_user_by_email, get_user_by_id,
+    insert_resume, get_user_resumes, get_resume_by_id, update_resume_row, delete_resume_row, get_user_usage,
+    import_resumes, user_uploaded_blob
 )
+import async_db
+from resume_export import EXPORT_FORMATS, ndjson_stream, zip_stream, read_import_records
+from static_files import StaticSite
+from compression import CompressionMiddleware, FastJSONResponse
+from shared_state import get_shared_state, single_flight, CapacityExceeded
+from quota import QuotaTicket, QuotaExceeded, acquire_quota
+from blob_store import put_blob, has_blob, is_valid_sha256, BlobResponse
+from profiling import is_admin, profile_request, load_profile, top_functions, aggregate_report, PROFILE_TOP_N
 
 # JWT 配置
 SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 7
 
+# 关闭时等待进行中 LLM 调用完成的最长时间（秒）
+DRAIN_TIMEOUT = float(os.environ.get("DRAIN_TIMEOUT", "30"))
+# 启动预热时提前导入的重量级依赖
+PRELOAD_MODULES = ("fitz", "docx2txt", "requests", "jwt")
+
 app = FastAPI(title="CVFiller 简历解析服务")
 
 # 配置 CORS
@@ -338,10 +216,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩（超过阈值的 JSON / 文本响应按 Accept-Encoding 使用 br 或 gzip）
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", "1024")),
+)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """为每个请求绑定请求 ID，并在超过阈值时输出分阶段耗时"""
+    request_id = request.headers.get("X-Request-ID")
+    with request_context(request_id, method=request.method, path=request.url.path) as request_id:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+# ========== 启动预热与关闭排空 ==========
+
+_ready = False
+
+
+def warm_up():
+    """预热：导入重量级依赖、打开数据库和共享状态、建立到上游的连接"""
+    with span("warmup"):
+        preload(PRELOAD_MODULES)
+        with get_db() as db:
+            db.execute("SELECT 1").fetchone()
+        get_shared_state().get("warmup")
+        llm_client.warm_up()
+    log.info("预热完成", extra={"fields": {"import_ms": dict(IMPORT_TIMINGS)}})
+
+
+async def warm_up_in_background():
+    """后台预热，完成前 /ready 返回 503；失败时间隔重试"""
+    global _ready
+    while True:
+        try:
+            await run_in_threadpool(warm_up)
+            break
+        except Exception:
+            log.exception("预热失败，5 秒后重试")
+            await asyncio.sleep(5)
+    _ready = True
+
+
 # 初始化数据库
 @app.on_event("startup")
 async def startup_event():
+    setup_logging()
     init_database()
+    # /health 立即可用，预热在后台进行
+    app.state.warm_up_task = asyncio.create_task(warm_up_in_background())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """停止接收流量后等待进行中的 LLM 调用完成"""
+    global _ready
+    _ready = False
+    app.state.warm_up_task.cancel()
+    await run_in_threadpool(llm_client.wait_for_idle, DRAIN_TIMEOUT)
+    llm_client.close()
+    await run_in_threadpool(async_db.close)
 
 
 # ========== Pydantic 模型 ==========
@@ -365,6 +302,9 @@ class ResumeData(BaseModel):
     experience: str = ""
     campusExperience: str = ""
     skills: str = ""
+    # 解析接口返回的原始文件信息，仅在创建简历时使用
+    sourceFilename: str = ""
+    sourceSha256: str = ""
 
 
 class TokenResponse(BaseModel):
@@ -396,29 +336,75 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
         # 支持 "Bearer token" 格式
         token = authorization.replace("Bearer ", "") if "Bearer " in authorization else authorization
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
+        subject = payload.get("sub")
+        if subject is None:
             raise HTTPException(status_code=401, detail="无效的认证信息")
+        # PyJWT 要求 sub 为字符串
+        user_id = int(subject)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="登录已过期，请重新登录")
-    except jwt.PyJWTError:
+    except (jwt.PyJWTError, ValueError):
         raise HTTPException(status_code=401, detail="无效的认证信息")
     
-    user = get_user_by_id(user_id)
+    user = await async_db.read(get_user_by_id, user_id)
     if user is None:
         raise HTTPException(status_code=401, detail="用户不存在")
     
     return user
 
 
+def require_quota(endpoint: str):
+    """生成按接口检查当前用户配额的依赖"""
+    async def dependency(current_user: dict = Depends(get_current_user)) -> QuotaTicket:
+        try:
+            return await acquire_quota(current_user["id"], endpoint)
+        except QuotaExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers=e.headers)
+        except CapacityExceeded:
+            raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试")
+    return dependency
+
+
+ALLOWED_RESUME_EXTENSIONS = ('.pdf', '.docx', '.doc')
+
+
+async def resume_upload(file: UploadFile = File(...)) -> UploadFile:
+    """检查上传的简历文件类型；作为依赖放在配额之前，格式错误的上传不消耗配额"""
+    if Path(file.filename or "").suffix.lower() not in ALLOWED_RESUME_EXTENSIONS:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"不支持的文件格式。请上传: {', '.join(ALLOWED_RESUME_EXTENSIONS)}"
+        )
+    return file
+
+
+def request_prompt(task: str):
+    """生成选择 prompt 版本的依赖：请求头 X-Prompt-Version 指定版本，否则按权重选择"""
+    def dependency(x_prompt_version: Optional[str] = Header(None)) -> PromptVersion:
+        try:
+            return select_prompt(task, x_prompt_version)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"未知的 prompt 版本: {x_prompt_version}")
+    return dependency
+
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    """要求当前用户为管理员"""
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="无管理员权限")
+    return current_user
+
+
 # ========== 用户认证 API ==========
 
 @app.post("/api/auth/register", response_model=TokenResponse)
 async def register(user_data: UserRegister):
     """用户注册"""
     try:
-        user = create_user(user_data.username, user_data.email, user_data.password)
-        access_token = create_access_token(data={"sub": user["id"]})
+        # 密码哈希是 CPU 密集操作，放在线程池中，写线程只负责插入
+        password_hash, salt = await run_in_threadpool(hash_password, user_data.password)
+        user = await async_db.write(insert_user, user_data.username, user_data.email, password_hash, salt)
+        access_token = create_access_token(data={"sub": str(user["id"])})
         return {
             "access_token": access_token,
             "token_type": "bearer",
@@ -431,11 +417,15 @@ async def register(user_data: UserRegister):
 @app.post("/api/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     """用户登录"""
-    user = authenticate_user(credentials.email, credentials.password)
-    if not user:
+    # 只在读连接池中查询用户；PBKDF2 校验是 CPU 密集操作，放在通用线程池中，不占用数据库读连接
+    row = await async_db.read(get_user_by_email, credentials.email)
+    if not row or not await run_in_threadpool(
+        verify_password, credentials.password, row["password_hash"], row["salt"]
+    ):
         raise HTTPException(status_code=401, detail="邮箱或密码错误")
+    user = {field: row[field] for field in ("id", "username", "email", "created_at")}
     
-    access_token = create_access_token(data={"sub": user["id"]})
+    access_token = create_access_token(data={"sub": str(user["id"])})
     return {
         "access_token": access_token,
         "token_type": "bearer",
@@ -443,6 +433,12 @@ async def login(credentials: UserLogin):
     }
 
 
+@app.get("/api/usage")
+async def get_usage(days: int = 30, current_user: dict = Depends(get_current_user)):
+    """获取当前用户最近的 LLM 用量"""
+    return {"status": "success", "usage": await async_db.read(get_user_usage, current_user["id"], days)}
+
+
 @app.get("/api/auth/me")
 async def get_me(current_user: dict = Depends(get_current_user)):
     """获取当前用户信息"""
@@ -456,28 +452,82 @@ async def create_resume(
     resume_data: ResumeData,
     current_user: dict = Depends(get_current_user)
 ):
-    """保存简历数据"""
-    resume_id = save_resume(current_user["id"], resume_data.dict())
+    """保存简历数据，并关联解析时保存的原始文件"""
+    data = resume_data.dict()
+    source_filename = data.pop("sourceFilename") or None
+    source_sha256 = data.pop("sourceSha256")
+    # 只能关联自己上传过的文件，不泄露其他用户的文件是否存在
+    if not (is_valid_sha256(source_sha256)
+            and await async_db.read(user_uploaded_blob, current_user["id"], source_sha256)
+            and has_blob(source_sha256)):
+        source_sha256 = None
+    resume_id = await async_db.write(insert_resume, current_user["id"], data, source_filename, source_sha256)
     return {"status": "success", "id": resume_id, "message": "简历保存成功"}
 
 
-@app.get("/api/resumes")
+@app.get("/api/resumes", response_class=FastJSONResponse)
 async def list_resumes(current_user: dict = Depends(get_current_user)):
     """获取用户的简历列表"""
-    resumes = get_user_resumes(current_user["id"])
-    return {"status": "success", "resumes": resumes}
+    resumes = await async_db.read(get_user_resumes, current_user["id"])
+    return FastJSONResponse({"status": "success", "resumes": resumes})
 
 
-@app.get("/api/resumes/{resume_id}")
+@app.get("/api/resumes/export")
+async def export_resumes(
+    format: str = "ndjson",
+    current_user: dict = Depends(get_current_user)
+):
+    """流式导出当前用户的全部简历（NDJSON 或 ZIP）"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式。可选: {', '.join(EXPORT_FORMATS)}")
+    stream = zip_stream if format == "zip" else ndjson_stream
+    filename = f"resumes-{datetime.now().strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        stream(current_user["id"]),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.post("/api/resumes/import")
+async def import_resumes_api(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """批量导入简历（NDJSON 或导出的 ZIP），全部成功或全部回滚"""
+    try:
+        records = read_import_records(file.file, file.filename or "")
+        count = await run_in_threadpool(import_resumes, current_user["id"], records)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=f"导入文件格式错误: {e}")
+    return {"status": "success", "imported": count, "message": f"成功导入 {count} 份简历"}
+
+
+@app.get("/api/resumes/{resume_id}", response_class=FastJSONResponse)
 async def get_resume(
     resume_id: int,
     current_user: dict = Depends(get_current_user)
 ):
     """获取单个简历详情"""
-    resume = get_resume_by_id(resume_id, current_user["id"])
+    resume = await async_db.read(get_resume_by_id, resume_id, current_user["id"])
     if not resume:
         raise HTTPException(status_code=404, detail="简历不存在")
-    return {"status": "success", "resume": resume}
+    return FastJSONResponse({"status": "success", "resume": resume})
+
+
+@app.get("/api/resumes/{resume_id}/file")
+async def download_resume_file(
+    resume_id: int,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """下载简历的原始文件（支持 Range）"""
+    resume = await async_db.read(get_resume_by_id, resume_id, current_user["id"])
+    if not resume:
+        raise HTTPException(status_code=404, detail="简历不存在")
+    if not has_blob(resume.get("source_sha256")):
+        raise HTTPException(status_code=404, detail="原始文件不存在")
+    return BlobResponse(resume["source_sha256"], resume["source_filename"], request.headers.get("range"))
 
 
 @app.put("/api/resumes/{resume_id}")
@@ -486,8 +536,11 @@ async def update_resume_api(
     resume_data: ResumeData,
     current_user: dict = Depends(get_current_user)
 ):
-    """更新简历数据"""
-    success = update_resume(resume_id, current_user["id"], resume_data.dict())
+    """更新简历数据（排队中的同一简历的更新会被合并，只写入最新内容）"""
+    success = await async_db.write(
+        update_resume_row, resume_id, current_user["id"], resume_data.dict(),
+        coalesce_key=("resume", resume_id, current_user["id"]),
+    )
     if not success:
         raise HTTPException(status_code=404, detail="简历不存在或无权限")
     return {"status": "success", "message": "简历更新成功"}
@@ -499,69 +552,78 @@ async def delete_resume_api(
     current_user: dict = Depends(get_current_user)
 ):
     """删除简历"""
-    success = delete_resume(resume_id, current_user["id"])
+    success = await async_db.write(delete_resume_row, resume_id, current_user["id"])
     if not success:
         raise HTTPException(status_code=404, detail="简历不存在或无权限")
     return {"status": "success", "message": "简历删除成功"}
 
-@app.post("/api/parse-resume")
+@app.post("/api/parse-resume", response_class=FastJSONResponse)
 async def api_parse_resume(
-    file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    request: Request,
+    file: UploadFile = Depends(resume_upload),
+    current_user: dict = Depends(get_current_user),
+    prompt: PromptVersion = Depends(request_prompt("parse")),
+    quota: QuotaTicket = Depends(require_quota("parse-resume"))
 ):
     """
     简历解析 API 端点（需要登录）
-    """
-    # 检查文件类型
-    allowed_extensions = {'.pdf', '.docx', '.doc'}
-    file_extension = Path(file.filename).suffix.lower()
-    
-    if file_extension not in allowed_extensions:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"不支持的文件格式。请上传: {', '.join(allowed_extensions)}"
-        )
     
+    管理员可通过请求头 X-Profile: 1 或 ?profile=1 剖析本次请求，响应头 X-Profile-Id 返回剖析结果 ID；
+    请求头 X-Prompt-Version 可指定 prompt 版本
+    """
     try:
         # 读取文件内容
         contents = await file.read()
         
-        # 解析简历
-        result = parse_resume_from_bytes(contents, file.filename)
+        # 解析简历（相同文件和 prompt 版本在所有 worker 间共享缓存，并发的重复上传只调用一次模型）
+        digest = hashlib.sha256(contents).hexdigest()
+        async with quota.metering():
+            with profile_request(request, current_user, "parse") as profiler:
+                compute = lambda: parse_resume_from_bytes(contents, file.filename, prompt)["parsed_data"]
+                if profiler:
+                    # 剖析的目的是看这份简历为什么慢，跳过缓存和去重，确保真正执行一次解析
+                    parsed_data = await single_flight(
+                        f"parse:{prompt.version}:{digest}", profiler.wrap(compute), slot="llm", ttl=0
+                    )
+                else:
+                    parsed_data = await single_flight(f"parse:{prompt.version}:{digest}", compute, slot="llm")
+        # 解析成功后才保存原始文件（按内容去重），便于下载和日后换模型重新解析；提取失败的文件不落盘
+        await run_in_threadpool(put_blob, contents, digest, current_user["id"])
+        headers = quota.headers()
+        if profiler and profiler.profile_id:
+            headers["X-Profile-Id"] = profiler.profile_id
         
-        return result
+        result = {
+            "status": "success",
+            "source_file": file.filename,
+            "source_sha256": digest,
+            "prompt_version": prompt.version,
+            "parsed_data": parsed_data
+        }
+        return FastJSONResponse(result, headers=headers)
         
+    except CapacityExceeded:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试")
     except Exception as e:
-        import traceback
-        print(f"[ERROR] Parse resume failed: {e}")
-        print(traceback.format_exc())
+        log.exception("简历解析失败")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/resume-advice")
+@app.post("/api/resume-advice", response_class=FastJSONResponse)
 async def api_resume_advice(
-    file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    file: UploadFile = Depends(resume_upload),
+    current_user: dict = Depends(get_current_user),
+    prompt: PromptVersion = Depends(request_prompt("advice")),
+    quota: QuotaTicket = Depends(require_quota("resume-advice"))
 ):
     """
-    简历修改建议 API 端点（需要登录）
+    简历修改建议 API 端点（需要登录），请求头 X-Prompt-Version 可指定 prompt 版本
     """
-    import traceback
-    
-    allowed_extensions = {'.pdf', '.docx', '.doc'}
-    file_extension = Path(file.filename).suffix.lower()
-    
-    if file_extension not in allowed_extensions:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"不支持的文件格式。请上传: {', '.join(allowed_extensions)}"
-        )
-    
     try:
-        print(f"[DEBUG] 收到简历建议请求: {file.filename}, 用户: {current_user['username']}")
-        
         # 读取文件内容
         contents = await file.read()
-        print(f"[DEBUG] 文件大小: {len(contents)} bytes")
+        log.debug("收到简历建议请求", extra={"fields": {
+            "filename": file.filename, "user_id": current_user["id"], "size": len(contents)
+        }})
         
         # 提取简历文本
         file_extension = Path(file.filename).suffix.lower()
@@ -571,9 +633,9 @@ async def api_resume_advice(
         
         resume_text = ""
         try:
-            resume_text = extract_text_from_file(tmp_path)
-            resume_text = preprocess_text(resume_text)
-            print(f"[DEBUG] 提取文本长度: {len(resume_text)} 字符")
+            with span("extract"):
+                resume_text = await run_in_threadpool(extract_text_from_file, tmp_path)
+                resume_text = preprocess_text(resume_text)
         finally:
             os.unlink(tmp_path)
         
@@ -581,29 +643,79 @@ async def api_resume_advice(
             raise HTTPException(status_code=400, detail="无法从简历中提取文本")
         
         # 调用 AI 生成建议
-        print("[DEBUG] 开始调用 AI 生成建议...")
-        advice = generate_resume_advice(resume_text)
-        print("[DEBUG] AI 建议生成成功")
+        digest = hashlib.sha256(contents).hexdigest()
+        async with quota.metering():
+            advice = await single_flight(
+                f"advice:{prompt.version}:{digest}",
+                lambda: generate_resume_advice(resume_text, prompt),
+                slot="llm",
+            )
         
-        return {
+        return FastJSONResponse({
             "status": "success",
             "source_file": file.filename,
+            "prompt_version": prompt.version,
             "advice": advice
-        }
+        }, headers=quota.headers())
         
+    except CapacityExceeded:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试")
     except Exception as e:
-        error_msg = f"[ERROR] 简历建议生成失败: {str(e)}"
-        print(error_msg)
-        print(traceback.format_exc())
+        log.exception("简历建议生成失败")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/admin/profiles")
+async def get_profile_summary(
+    limit: int = PROFILE_TOP_N,
+    sort: str = "cumulative",
+    admin_user: dict = Depends(get_admin_user)
+):
+    """被剖析请求的热点函数汇总（PROFILE_DIR 中保留的所有结果，所有 worker 共享）"""
+    return {"status": "success", **await run_in_threadpool(aggregate_report, limit, sort)}
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    limit: int = PROFILE_TOP_N,
+    sort: str = "cumulative",
+    admin_user: dict = Depends(get_admin_user)
+):
+    """单次剖析结果的热点函数"""
+    stats = load_profile(profile_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在")
+    return {"status": "success", "profile_id": profile_id, "functions": top_functions(stats, limit, sort)}
+
+
+@app.get("/api/admin/metrics/models")
+async def get_model_metrics(admin_user: dict = Depends(get_admin_user)):
+    """模型级联的路由指标：各级模型的调用、接受、升级、失败次数及平均耗时"""
+    return {"status": "success", **await run_in_threadpool(cascade_metrics)}
+
+
+@app.get("/api/admin/metrics/prompts")
+async def get_prompt_metrics(admin_user: dict = Depends(get_admin_user)):
+    """各 prompt 版本的流量权重、system prompt token 估算及调用耗时、token、解析成功率"""
+    return {"status": "success", "tasks": await run_in_threadpool(prompt_stats)}
+
+
 @app.get("/health")
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "CVFiller Resume Parser"}
 
 
+@app.get("/ready")
+@app.get("/api/ready")
+async def readiness_check():
+    """就绪检查：预热完成后才返回 200，用于负载均衡摘挂流量"""
+    if not _ready:
+        return FastJSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready", "import_ms": IMPORT_TIMINGS}
+
+
 # ========== 静态文件服务（前端） ==========
 
 # 获取静态文件目录路径
@@ -612,26 +724,35 @@ if not os.path.exists(STATIC_DIR):
     # Docker 环境中的路径
     STATIC_DIR = "/app/dist"
 
-# 挂载静态文件目录
+# 挂载静态文件目录（启动时扫描一次，index.html 常驻内存）
 if os.path.exists(STATIC_DIR):
-    app.mount("/assets", StaticFiles(directory=os.path.join(STATIC_DIR, "assets")), name="assets")
+    static_site = StaticSite(STATIC_DIR)
     
-    @app.get("/", response_class=FileResponse)
-    async def serve_index():
+    @app.get("/assets/{path:path}")
+    async def serve_asset(path: str, request: Request):
+        """提供带内容哈希的构建产物"""
+        response = static_site.file_response(request, f"assets/{path}")
+        if response is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        return response
+    
+    @app.get("/")
+    async def serve_index(request: Request):
         """提供首页"""
-        return FileResponse(os.path.join(STATIC_DIR, "index.html"))
+        return static_site.index_response(request)
     
     @app.get("/{path:path}")
-    async def serve_spa(path: str):
+    async def serve_spa(path: str, request: Request):
         """SPA 路由处理"""
         # API 路由不走这里
         if path.startswith("api/"):
             raise HTTPException(status_code=404, detail="Not Found")
+        # 构建产物中的顶层文件（如 vite.svg）直接返回
+        response = static_site.file_response(request, path)
+        if response is not None:
+            return response
         # 其他路由返回 index.html 支持前端路由
-        index_file = os.path.join(STATIC_DIR, "index.html")
-        if os.path.exists(index_file):
-            return FileResponse(index_file)
-        raise HTTPException(status_code=404, detail="Not Found")
+        return static_site.index_response(request)
 
 
 def preprocess_text(text: str) -> str:
@@ -645,65 +766,34 @@ def preprocess_text(text: str) -> str:
     return text
 
 
-def generate_resume_advice(resume_text: str) -> Dict[str, Any]:
+def generate_resume_advice(resume_text: str, prompt: Optional[PromptVersion] = None) -> Dict[str, Any]:
     """
-    使用 AI 生成简历修改建议
+    使用 AI 生成简历修改建议，输出不完整时按 ADVICE_MODEL_CASCADE 升级模型
     """
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {AI_API_KEY}"
-    }
-    
-    payload = {
-        "model": "hunyuan-lite",
-        "messages": [
-            {
-                "role": "system",
-                "content": RESUME_ADVICE_PROMPT
-            },
-            {
-                "role": "user",
-                "content": f"请分析以下简历并提供修改建议：\n\n---简历开始---\n{resume_text}\n---简历结束---"
-            }
-        ],
-        "temperature": 0.3,
-        "max_tokens": 4096
-    }
+    prompt = prompt or select_prompt("advice")
     
     try:
-        response = requests.post(
-            AI_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-        response.raise_for_status()
-        
-        result = response.json()
-        
-        if "choices" in result and len(result["choices"]) > 0:
-            generated_text = result["choices"][0]["message"]["content"]
-            
-            # 解析 JSON
-            try:
-                advice_data = json.loads(generated_text)
-                return advice_data
-            except json.JSONDecodeError as e:
-                # 尝试清理后重新解析
-                cleaned_text = generated_text.strip()
-                if cleaned_text.startswith("```json"):
-                    cleaned_text = cleaned_text[7:]
-                if cleaned_text.endswith("```"):
-                    cleaned_text = cleaned_text[:-3]
-                return json.loads(cleaned_text.strip())
-        else:
-            raise Exception("API 返回结果异常")
-            
+        return run_cascade(prompt, resume_text, parse_model_json, score_resume_advice)
     except Exception as e:
-        print(f"生成建议错误: {e}")
+        log.warning("生成建议错误", extra={"fields": {"error": str(e)}})
         raise
 
 
+def default_worker_count() -> int:
+    """worker 数：优先使用 WEB_CONCURRENCY，否则取本进程可用的 CPU 核数"""
+    if os.environ.get("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "resume_parser:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8000")),
+        workers=default_worker_count(),
+        timeout_graceful_shutdown=int(DRAIN_TIMEOUT),
+    )
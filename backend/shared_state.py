@@ -0,0 +1,324 @@
+"""
+跨进程共享状态模块
+多 worker / 多副本部署时，解析缓存、LLM 并发限制和进行中任务的状态都放在共享后端里。
+
+后端只需实现 redis-py 的一个子集（get / set / delete / incrby / expire / pipeline），
+默认使用同一主机内多进程共享的 SQLite 文件；配置 SHARED_STATE_URL=redis://... 时
+直接使用 Redis 客户端，任何兼容该接口的替身（如 fakeredis）也可以通过 set_shared_state 注入。
+"""
+
+import os
+import time
+import random
+import asyncio
+import sqlite3
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from typing import Optional, Dict, Any, Callable
+
+import orjson
+
+from tracing import get_logger
+
+SHARED_STATE_URL = os.environ.get("SHARED_STATE_URL", "")
+SHARED_STATE_PATH = os.environ.get("SHARED_STATE_PATH", "./data/shared_state.db")
+# 解析结果缓存时间（秒），0 表示不缓存
+PARSE_CACHE_TTL = int(os.environ.get("PARSE_CACHE_TTL", "86400"))
+# 所有 worker 合计同时进行的 LLM 调用数，0 表示不限制
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "0"))
+# 等待并发名额或等待其他 worker 完成同一任务的最长时间（秒）
+SHARED_WAIT_TIMEOUT = float(os.environ.get("SHARED_WAIT_TIMEOUT", "90"))
+
+# 进行中标记和并发计数的过期时间，防止 worker 崩溃后残留
+_INFLIGHT_TTL = 120
+_POLL_INTERVAL = 0.2
+# 互斥锁的过期时间与轮询间隔，锁只保护很短的读-改-写
+_LOCK_TTL = 10
+_LOCK_POLL_INTERVAL = 0.01
+
+log = get_logger("shared_state")
+
+
+class CapacityExceeded(Exception):
+    """等待共享并发名额超时"""
+
+
+class SQLiteState:
+    """基于 SQLite 文件的共享状态，接口与 redis-py 的同名方法一致"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS kv (
+                    key TEXT PRIMARY KEY,
+                    value BLOB,
+                    expires_at REAL
+                )
+            ''')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """写事务：BEGIN IMMEDIATE 取得写锁，保证读-改-写在多进程间原子"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _expires_at(ex: Optional[int]) -> Optional[float]:
+        return time.time() + ex if ex else None
+
+    def _purge(self, conn: sqlite3.Connection, key: str):
+        conn.execute("DELETE FROM kv WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                     (key, time.time()))
+
+    def get(self, name: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (name, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        value = row[0]
+        return str(value).encode() if isinstance(value, int) else value
+
+    def set(self, name: str, value, ex: Optional[int] = None, nx: bool = False) -> bool:
+        if isinstance(value, str):
+            value = value.encode()
+        with self._transaction() as conn:
+            self._purge(conn, name)
+            if nx:
+                cursor = conn.execute("INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                                      (name, value, self._expires_at(ex)))
+                stored = cursor.rowcount > 0
+            else:
+                conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                             (name, value, self._expires_at(ex)))
+                stored = True
+            # 顺带清理少量过期数据
+            if random.random() < 0.01:
+                conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        return stored
+
+    def delete(self, *names: str) -> int:
+        with self._transaction() as conn:
+            cursor = conn.execute(f"DELETE FROM kv WHERE key IN ({','.join('?' * len(names))})", names)
+        return cursor.rowcount
+
+    def _incrby(self, conn: sqlite3.Connection, name: str, amount: int) -> int:
+        self._purge(conn, name)
+        row = conn.execute("SELECT value, expires_at FROM kv WHERE key = ?", (name,)).fetchone()
+        value = (int(row[0]) if row else 0) + amount
+        conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                     (name, value, row[1] if row else None))
+        return value
+
+    def incrby(self, name: str, amount: int = 1) -> int:
+        with self._transaction() as conn:
+            return self._incrby(conn, name, amount)
+
+    def pipeline(self, transaction: bool = True) -> "_SQLitePipeline":
+        return _SQLitePipeline(self)
+
+    def expire(self, name: str, time_seconds: int) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE kv SET expires_at = ? WHERE key = ?",
+                                  (time.time() + time_seconds, name))
+        return cursor.rowcount > 0
+
+
+class _SQLitePipeline:
+    """redis-py pipeline 的子集：排队的 incrby 在 execute 时于同一个事务中执行"""
+
+    def __init__(self, state: SQLiteState):
+        self._state = state
+        self._ops = []
+
+    def incrby(self, name: str, amount: int = 1) -> "_SQLitePipeline":
+        self._ops.append((name, amount))
+        return self
+
+    def execute(self) -> list:
+        ops, self._ops = self._ops, []
+        if not ops:
+            return []
+        with self._state._transaction() as conn:
+            return [self._state._incrby(conn, name, amount) for name, amount in ops]
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state():
+    """按配置创建共享状态后端（进程内单例）"""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                if SHARED_STATE_URL.startswith(("redis://", "rediss://", "unix://")):
+                    import redis
+                    _state = redis.Redis.from_url(SHARED_STATE_URL)
+                else:
+                    _state = SQLiteState(SHARED_STATE_PATH)
+    return _state
+
+
+def set_shared_state(state):
+    """注入自定义的共享状态后端（任何实现 get/set/delete/incrby/expire/pipeline 的对象）"""
+    global _state
+    _state = state
+
+
+# ========== 计数器 ==========
+
+def incr_counters(counts: Dict[str, int]):
+    """一次提交多个计数器增量：SQLite 后端合并为一个事务，Redis 后端合并为一次 MULTI/EXEC"""
+    pipe = get_shared_state().pipeline()
+    for name, amount in counts.items():
+        pipe.incrby(name, amount)
+    pipe.execute()
+
+
+# ========== 解析缓存 ==========
+
+def cache_get(key: str) -> Optional[Dict[str, Any]]:
+    value = get_shared_state().get(f"cache:{key}")
+    return orjson.loads(value) if value is not None else None
+
+
+def cache_set(key: str, value: Dict[str, Any], ttl: int = PARSE_CACHE_TTL):
+    get_shared_state().set(f"cache:{key}", orjson.dumps(value), ex=ttl)
+
+
+async def _off_loop(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """在线程中调用共享状态后端（SQLite 写事务和 Redis 请求都是阻塞的），避免卡住事件循环"""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+# ========== 并发限制 ==========
+
+@asynccontextmanager
+async def concurrency_slot(name: str, limit: int = LLM_MAX_CONCURRENCY, timeout: float = SHARED_WAIT_TIMEOUT):
+    """
+    占用一个跨 worker 共享的并发名额，limit 为 0 时不做限制
+
+    Raises:
+        CapacityExceeded: 等待超过 timeout 仍未获得名额
+    """
+    if limit <= 0:
+        yield
+        return
+
+    state = get_shared_state()
+    key = f"slots:{name}"
+    deadline = time.monotonic() + timeout
+    while True:
+        if await _off_loop(state.incrby, key, 1) <= limit:
+            await _off_loop(state.expire, key, _INFLIGHT_TTL)
+            break
+        await _off_loop(state.incrby, key, -1)
+        if time.monotonic() >= deadline:
+            raise CapacityExceeded(f"{name} 并发已满")
+        await asyncio.sleep(_POLL_INTERVAL)
+
+    try:
+        yield
+    finally:
+        if await _off_loop(state.incrby, key, -1) < 0:
+            await _off_loop(state.delete, key)
+
+
+@asynccontextmanager
+async def shared_lock(name: str, timeout: float = 5.0):
+    """
+    跨 worker 的互斥锁，用于保护共享状态上的读-改-写
+
+    Raises:
+        CapacityExceeded: 超过 timeout 仍未拿到锁
+    """
+    state = get_shared_state()
+    key = f"lock:{name}"
+    deadline = time.monotonic() + timeout
+    while not await _off_loop(state.set, key, b"1", ex=_LOCK_TTL, nx=True):
+        if time.monotonic() >= deadline:
+            raise CapacityExceeded(f"{name} 锁等待超时")
+        await asyncio.sleep(_LOCK_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        await _off_loop(state.delete, key)
+
+
+# ========== 进行中任务去重 ==========
+
+def _compute_and_cache(key: str, compute: Callable[[], Dict[str, Any]], ttl: int) -> Dict[str, Any]:
+    """在同一线程内计算并写缓存：请求在关闭时被取消后，排空中完成的结果仍会进入缓存供重试命中"""
+    result = compute()
+    cache_set(key, result, ttl)
+    return result
+
+
+async def single_flight(
+    key: str,
+    compute: Callable[[], Dict[str, Any]],
+    slot: Optional[str] = None,
+    ttl: int = PARSE_CACHE_TTL,
+) -> Dict[str, Any]:
+    """
+    相同 key 的任务在所有 worker 中只执行一次，结果写入共享缓存
+
+    先查缓存；未命中时抢占进行中标记，抢到的 worker 负责计算（slot 不为空时还需占用并发名额），
+    其余 worker 轮询等待缓存结果。持有者失败或等待超时后，当前 worker 自行计算。
+
+    compute 是阻塞函数，在线程中执行（asyncio.to_thread 会复制 contextvars，请求追踪和用量统计不受影响）。
+    ttl 为 0 时关闭缓存和去重，每次都计算（用于压测 LLM 路径）
+    """
+    if ttl <= 0:
+        if slot:
+            async with concurrency_slot(slot):
+                return await asyncio.to_thread(compute)
+        return await asyncio.to_thread(compute)
+
+    cached = await _off_loop(cache_get, key)
+    if cached is not None:
+        return cached
+
+    state = get_shared_state()
+    lock_key = f"inflight:{key}"
+    deadline = time.monotonic() + SHARED_WAIT_TIMEOUT
+    while True:
+        if await _off_loop(state.set, lock_key, b"running", ex=_INFLIGHT_TTL, nx=True):
+            try:
+                if slot:
+                    async with concurrency_slot(slot):
+                        return await asyncio.to_thread(_compute_and_cache, key, compute, ttl)
+                return await asyncio.to_thread(_compute_and_cache, key, compute, ttl)
+            finally:
+                await _off_loop(state.delete, lock_key)
+
+        await asyncio.sleep(_POLL_INTERVAL)
+        cached = await _off_loop(cache_get, key)
+        if cached is not None:
+            return cached
+        if time.monotonic() >= deadline:
+            log.warning("等待进行中任务超时，自行计算", extra={"fields": {"key": key}})
+            return await asyncio.to_thread(compute)
@@ -0,0 +1,148 @@
+"""
+前端静态文件服务
+启动时建立静态文件索引：index.html 读入内存并计算 ETag，
+/assets 下 Vite 生成的内容哈希文件按 Accept-Encoding 返回预压缩版本并长期缓存
+"""
+
+import os
+import gzip
+import hashlib
+import mimetypes
+from typing import Optional, Dict, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, FileResponse
+
+from compression import parse_accept_encoding
+
+try:
+    import brotli
+except ImportError:  # brotli 不可用时只提供 gzip
+    brotli = None
+
+# 内容哈希文件名，内容变化时文件名随之变化，可以永久缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 非哈希的顶层文件（如 public/ 下的图标）
+PUBLIC_CACHE_CONTROL = "public, max-age=3600"
+# index.html 每次都需校验，配合 ETag 返回 304
+INDEX_CACHE_CONTROL = "no-cache"
+
+# (Content-Encoding, 预压缩文件后缀)，按优先级排列
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+COMPRESSIBLE_EXTENSIONS = {".html", ".js", ".mjs", ".css", ".svg", ".json", ".txt", ".map", ".xml", ".ico"}
+
+
+class _StaticFile:
+    """一个静态文件及其预压缩版本的路径与 stat 信息"""
+
+    def __init__(self, path: str, stat_result: os.stat_result):
+        self.path = path
+        self.stat_result = stat_result
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.variants: Dict[str, Tuple[str, os.stat_result]] = {}
+
+
+class StaticSite:
+    """启动时扫描一次构建产物目录，请求期间不再访问文件系统元数据"""
+
+    def __init__(self, static_dir: str):
+        self.static_dir = static_dir
+        self.files: Dict[str, _StaticFile] = {}
+        self.index_body: Optional[bytes] = None
+        self.index_etag = ""
+        self.index_variants: Dict[str, bytes] = {}
+        self._scan()
+        self._load_index()
+
+    def _scan(self):
+        suffixes = tuple(suffix for _, suffix in PRECOMPRESSED_ENCODINGS)
+        for root, _, filenames in os.walk(self.static_dir):
+            for filename in filenames:
+                if filename.endswith(suffixes):
+                    continue
+                path = os.path.join(root, filename)
+                rel_path = os.path.relpath(path, self.static_dir).replace(os.sep, "/")
+                static_file = _StaticFile(path, os.stat(path))
+                for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+                    if os.path.exists(path + suffix):
+                        static_file.variants[encoding] = (path + suffix, os.stat(path + suffix))
+                self.files[rel_path] = static_file
+
+    def _load_index(self):
+        index_file = self.files.pop("index.html", None)
+        if index_file is None:
+            return
+        with open(index_file.path, "rb") as f:
+            self.index_body = f.read()
+        self.index_etag = '"' + hashlib.sha256(self.index_body).hexdigest()[:32] + '"'
+        self.index_variants["gzip"] = gzip.compress(self.index_body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            self.index_variants["br"] = brotli.compress(self.index_body)
+
+    def index_response(self, request: Request) -> Response:
+        """返回内存中的 index.html，支持 If-None-Match 与压缩"""
+        if self.index_body is None:
+            return Response(status_code=404)
+        headers = {
+            "ETag": self.index_etag,
+            "Cache-Control": INDEX_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match", "")
+        if self.index_etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        accepted = parse_accept_encoding(request.headers.get("accept-encoding", ""))
+        for encoding, _ in PRECOMPRESSED_ENCODINGS:
+            if encoding in accepted and encoding in self.index_variants:
+                headers["Content-Encoding"] = encoding
+                return Response(self.index_variants[encoding], media_type="text/html", headers=headers)
+        return Response(self.index_body, media_type="text/html", headers=headers)
+
+    def file_response(self, request: Request, rel_path: str) -> Optional[Response]:
+        """返回构建产物中的文件，优先使用客户端接受的预压缩版本；文件不存在时返回 None"""
+        static_file = self.files.get(rel_path)
+        if static_file is None:
+            return None
+        cache_control = IMMUTABLE_CACHE_CONTROL if rel_path.startswith("assets/") else PUBLIC_CACHE_CONTROL
+        headers = {"Cache-Control": cache_control}
+        if static_file.variants:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = parse_accept_encoding(request.headers.get("accept-encoding", ""))
+            for encoding, _ in PRECOMPRESSED_ENCODINGS:
+                if encoding in accepted and encoding in static_file.variants:
+                    path, stat_result = static_file.variants[encoding]
+                    headers["Content-Encoding"] = encoding
+                    return FileResponse(path, media_type=static_file.media_type,
+                                        headers=headers, stat_result=stat_result)
+        return FileResponse(static_file.path, media_type=static_file.media_type,
+                            headers=headers, stat_result=static_file.stat_result)
+
+
+def precompress_directory(static_dir: str, min_size: int = 1024) -> int:
+    """为构建产物生成 .gz / .br 预压缩文件，返回处理的文件数"""
+    count = 0
+    for root, _, filenames in os.walk(static_dir):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = os.path.join(root, filename)
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(path + ".br", "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "dist")
+    print(f"precompressed {precompress_directory(target)} files in {target}")
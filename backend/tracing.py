@@ -0,0 +1,154 @@
+"""
+日志与请求追踪模块
+结构化 JSON 日志经队列异步写出，请求 ID 贯穿 文本提取 → LLM → 数据库 各阶段
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# 调试载荷（模型原始输出等）的采样率，0 表示从不记录，1 表示全部记录
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+LOG_PAYLOAD_MAX_CHARS = int(os.environ.get("LOG_PAYLOAD_MAX_CHARS", "2000"))
+# 慢请求阈值（毫秒），0 表示关闭慢请求日志
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))
+
+logger = logging.getLogger("cvfiller")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_payload_sampled: ContextVar[bool] = ContextVar("payload_sampled", default=False)
+_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("stages", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _RequestContextFilter(logging.Filter):
+    """在调用线程中把当前请求 ID 写入日志记录"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+def setup_logging():
+    """配置 cvfiller 日志：调用方只入队，由后台线程负责写 stdout"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # 格式化在入队前完成，确保请求上下文和异常信息在当前线程中被捕获
+    queue_handler.setFormatter(JsonFormatter())
+    queue_handler.addFilter(_RequestContextFilter())
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger.addHandler(queue_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取 cvfiller 下的子 logger"""
+    return logger.getChild(name)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None, **fields):
+    """
+    请求上下文：绑定请求 ID、决定本请求是否采样调试载荷，并汇总各阶段耗时
+
+    Yields:
+        当前请求 ID
+    """
+    request_id = request_id or uuid.uuid4().hex
+    stages: List[Tuple[str, float]] = []
+    sampled = LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < LOG_PAYLOAD_SAMPLE_RATE
+    tokens = (
+        _request_id.set(request_id),
+        _payload_sampled.set(sampled),
+        _stages.set(stages),
+    )
+    start = time.perf_counter()
+    try:
+        yield request_id
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if SLOW_REQUEST_MS and elapsed_ms >= SLOW_REQUEST_MS:
+            logger.warning("slow request", extra={"fields": {
+                **fields,
+                "duration_ms": round(elapsed_ms, 2),
+                "stages": [{"stage": name, "duration_ms": ms} for name, ms in stages],
+            }})
+        _stages.reset(tokens[2])
+        _payload_sampled.reset(tokens[1])
+        _request_id.reset(tokens[0])
+
+
+@contextmanager
+def span(name: str, **fields):
+    """记录一个处理阶段的耗时，计入当前请求的阶段明细"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        stages = _stages.get()
+        if stages is not None:
+            stages.append((name, elapsed_ms))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("span", extra={"fields": {"span": name, "duration_ms": elapsed_ms, **fields}})
+
+
+def log_payload(message: str, payload: str, **fields):
+    """仅在本请求被采样时记录调试载荷，并截断到 LOG_PAYLOAD_MAX_CHARS"""
+    if not _payload_sampled.get():
+        return
+    if len(payload) > LOG_PAYLOAD_MAX_CHARS:
+        fields["truncated_from"] = len(payload)
+        payload = payload[:LOG_PAYLOAD_MAX_CHARS]
+    logger.info(message, extra={"fields": {**fields, "payload": payload}})
+
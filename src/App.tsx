@@ -65,6 +65,7 @@ function App() {
   const [editInfo, setEditInfo] = useState<ResumeInfo>(emptyResumeInfo);
   const [hasFile, setHasFile] = useState(false);
   const [uploadedFile, setUploadedFile] = useState<File | null>(null);
+  const [sourceSha256, setSourceSha256] = useState<string>('');
   const [isUploading, setIsUploading] = useState(false);
   const [isEditing, setIsEditing] = useState(false);
   const [advice, setAdvice] = useState<ResumeAdvice | null>(null);
@@ -220,7 +221,11 @@ function App() {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`
         },
-        body: JSON.stringify(editInfo)
+        body: JSON.stringify({
+          ...editInfo,
+          sourceFilename: uploadedFile?.name || '',
+          sourceSha256
+        })
       });
 
       const result = await response.json();
@@ -360,6 +365,7 @@ function App() {
         
         setExtractedInfo(mappedData);
         setEditInfo(mappedData);
+        setSourceSha256(result.source_sha256 || '');
         setHasFile(true);
         showNotification('成功', '简历解析完成！', 'success');
       } else {
@@ -634,6 +640,7 @@ function App() {
                           setExtractedInfo(emptyResumeInfo);
                           setEditInfo(emptyResumeInfo);
                           setUploadedFile(null);
+                          setSourceSha256('');
                           setAdvice(null);
                           setShowAdviceDialog(false);
                         }}